@@ -0,0 +1,156 @@
+"""
+Check the slurm_tools daemon against stub squeue/sinfo/scontrol binaries.
+
+A fake cluster is put in front of PATH: the stubs print a few running and pending jobs
+and log every call. The same commands are run in process (SLURM_TOOLS_NO_DAEMON=1) and
+forwarded to a daemon with its own socket and cache dir. Their output and exit code must
+match, and the daemon must answer all forwarded calls from one squeue/sinfo call per
+snapshot TTL. Prints the best wall-clock time of both ways. Exits with status 1 on a
+mismatch.
+
+Example
+-------
+python benchmarks/daemon_roundtrip.py --runs 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQUEUE = """\
+101|alice|R|gpu|1000|1:00:00|4:00:00|2|gres/gpu:8|n[1-2]|None|train
+102|bob|R|gpu|900|0:30:00|1:00:00|1|gres/gpu:4|n3|None|eval
+103|carol|PD|gpu|800|0:00|2:00:00|2|gres/gpu:8|(null)|Resources|big
+"""
+SINFO = """\
+n1|gpu:8|gpu*|alloc
+n2|gpu:8|gpu*|alloc
+n3|gpu:8|gpu*|mix
+n4|gpu:8|gpu*|idle
+"""
+SCONTROL = "".join(
+    f"NodeName=n{i} Gres=gpu:8 Partitions=gpu State=IDLE\n" for i in range(1, 5)
+)
+# (argv, expected exit code)
+COMMANDS = [
+    (["estimate_start", "--n_gpu", "8", "--n_nodes", "1", "--partition", "gpu"], 0),
+    (["estimate_start", "--n_gpu", "8", "--n_nodes", "3", "--partition", "gpu"], 0),
+    (["estimate_start", "--n_gpu", "16", "--partition", "gpu"], 0),
+    (["reindex"], 0),
+    (["monitor_run"], 1),
+    (["estimate_start", "--time", "not-a-time"], 2),
+]
+
+
+def write_stubs(bin_dir: str, calls_path: str):
+    """squeue/sinfo/scontrol that fail for --json and print the fake cluster otherwise."""
+    for name, output in (("squeue", SQUEUE), ("sinfo", SINFO), ("scontrol", SCONTROL)):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as file:
+            file.write(
+                "#!/bin/sh\n"
+                f'echo "{name} $*" >> "{calls_path}"\n'
+                'case "$*" in *--json*) exit 1;; esac\n'
+                f"cat <<'EOF'\n{output}EOF\n"
+            )
+        os.chmod(path, 0o755)
+
+
+def run(argv: list[str], env: dict) -> tuple[float, subprocess.CompletedProcess]:
+    module = dict(
+        estimate_start="slurm_tools.backfill_sim",
+        reindex="slurm_tools.run_index",
+        monitor_run="slurm_tools.monitor_newest_slurm_run",
+    )[argv[0]]
+    code = f"import sys; sys.argv = {argv!r}; from {module} import main; main()"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    return time.perf_counter() - start, proc
+
+
+def count_calls(calls_path: str, name: str) -> int:
+    try:
+        with open(calls_path, "r") as file:
+            return sum(line.split()[0] == name for line in file)
+    except FileNotFoundError:
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_dir, home = os.path.join(tmp, "bin"), os.path.join(tmp, "home")
+        os.makedirs(bin_dir)
+        os.makedirs(os.path.join(home, "runs"))
+        calls_path = os.path.join(tmp, "calls.log")
+        write_stubs(bin_dir, calls_path)
+        env = {
+            **os.environ,
+            "PATH": bin_dir + os.pathsep + os.environ["PATH"],
+            "HOME": home,
+            "PYTHONPATH": ROOT,
+            "SLURM_TOOLS_CACHE_DIR": os.path.join(tmp, "cache"),
+            "SLURM_TOOLS_DAEMON_SOCKET": os.path.join(tmp, "daemon.sock"),
+        }
+        env.pop("SLURM_TOOLS_NO_DAEMON", None)
+        local_env = {**env, "SLURM_TOOLS_NO_DAEMON": "1"}
+        daemon = [sys.executable, "-m", "slurm_tools.daemon"]
+
+        subprocess.run([*daemon, "start"], env=env, check=True, cwd=tmp)
+        failed = False
+        try:
+            squeue_before = count_calls(calls_path, "squeue")
+            for argv, expected in COMMANDS:
+                local_s, forwarded_s = float("inf"), float("inf")
+                for _ in range(args.runs):
+                    seconds, local = run(argv, local_env)
+                    local_s = min(local_s, seconds)
+                    seconds, forwarded = run(argv, env)
+                    forwarded_s = min(forwarded_s, seconds)
+                ok = (
+                    local.returncode == forwarded.returncode == expected
+                    and local.stdout == forwarded.stdout
+                    and local.stderr == forwarded.stderr
+                )
+                failed |= not ok
+                print(
+                    f"{'✅' if ok else '❌'} {' '.join(argv):<56} "
+                    f"{local_s * 1000:6.1f} ms in process, "
+                    f"{forwarded_s * 1000:6.1f} ms forwarded"
+                )
+                if not ok:
+                    print(f"   in process ({local.returncode}): {local.stdout}{local.stderr}")
+                    print(
+                        f"   forwarded ({forwarded.returncode}): "
+                        f"{forwarded.stdout}{forwarded.stderr}"
+                    )
+            status = subprocess.run(
+                [*daemon, "status"], env=env, capture_output=True, text=True
+            ).stdout
+            print(status.strip())
+        finally:
+            subprocess.run([*daemon, "stop"], env=env, capture_output=True)
+
+        # The in-process runs share the on-disk snapshot cache with the daemon, so all
+        # runs together make at most a few squeue calls per TTL
+        squeue_calls = count_calls(calls_path, "squeue") - squeue_before
+        print(f"squeue was called {squeue_calls} times")
+        if squeue_calls > 4:
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
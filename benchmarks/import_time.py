@@ -0,0 +1,93 @@
+"""
+Check the startup time of every console script against a time budget.
+
+For each entry point in pyproject.toml, the module is imported in a fresh interpreter
+with `-X importtime`. The best wall-clock time of a few runs (interpreter startup plus
+import) must stay below the budget. The slowest imports are listed for modules over
+budget. Exits with status 1 if any module is over budget.
+
+Example
+-------
+python benchmarks/import_time.py --budget_ms 100 --runs 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def console_scripts() -> dict[str, str]:
+    """name -> module of the [project.scripts] section of pyproject.toml"""
+    scripts, in_section = {}, False
+    with open(os.path.join(ROOT, "pyproject.toml"), "r") as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith("["):
+                in_section = line == "[project.scripts]"
+            elif in_section and "=" in line:
+                name, target = (x.strip().strip('"') for x in line.split("=", 1))
+                scripts[name] = target.split(":")[0]
+    return scripts
+
+
+def measure(module: str, runs: int) -> tuple[float, list[tuple[int, str]]]:
+    """Best wall-clock seconds of `python -X importtime -c 'import module'` and the
+    (cumulative microseconds, name) of every import of the fastest run.
+    """
+    best, best_imports = float("inf"), []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start
+        if elapsed < best:
+            best = elapsed
+            best_imports = [
+                (int(m.group(2)), m.group(4))
+                for m in map(IMPORTTIME_RE.match, proc.stderr.splitlines())
+                if m
+            ]
+    return best, best_imports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--budget_ms", type=float, default=100)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=8, help="Imports to list when over budget."
+    )
+    args = parser.parse_args()
+
+    over_budget = []
+    for name, module in console_scripts().items():
+        seconds, imports = measure(module, args.runs)
+        import_us = dict((n, us) for us, n in imports).get(module, 0)
+        ok = seconds * 1000 <= args.budget_ms
+        print(
+            f"{'✅' if ok else '❌'} {name:<16} {seconds * 1000:6.1f} ms total, "
+            f"{import_us / 1000:6.1f} ms importing {module}"
+        )
+        if not ok:
+            over_budget.append(name)
+            for us, imported in sorted(imports, reverse=True)[: args.top]:
+                print(f"      {us / 1000:6.1f} ms  {imported}")
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,31 @@
 import os
+import getpass
 from typing import Optional
 import argparse
-import subprocess
+from slurm_tools.cluster_snapshot import get_snapshot
+from slurm_tools.slurm_time_until_start import fmt_duration
 
 
 def attach(shell: str = "bash", jobid: Optional[int] = None):
     if jobid is None:
-        proc_data = (
-            subprocess.check_output(["squeue", "--me"]).decode("utf-8").splitlines()[1:]
-        )
+        user = getpass.getuser()
+        proc_data = get_snapshot().jobs_of(user)
+        if not proc_data:
+            # The cached snapshot may predate a job that just started
+            proc_data = get_snapshot(refresh=True).jobs_of(user)
         if not proc_data:
             raise RuntimeError("No jobs running.")
 
         if len(proc_data) > 1:
             print("Multiple jobs running. Choose one:")
-            for i, line in enumerate(proc_data):
-                print(f"{i}: {' '.join(line.split())}")
-            choice = proc_data[int(input())].split()[0]
+            for i, job in enumerate(proc_data):
+                print(
+                    f"{i}: {job.jobid} {job.partition} {job.name} {job.state} "
+                    f"{fmt_duration(job.elapsed_s)} {job.n_nodes} {job.nodelist or job.reason}"
+                )
+            choice = proc_data[int(input())].jobid
         else:
-            choice = proc_data[0].split()[0]
+            choice = proc_data[0].jobid
     else:
         choice = jobid
 
@@ -0,0 +1,336 @@
+"""
+Predict when a job will start by replaying the queue in a discrete-event simulation.
+
+Running jobs free their GPUs when their time limit is reached. Pending jobs of the
+partition are started in priority order as soon as enough nodes have enough free GPUs.
+Our own hypothetical job is queued behind all jobs with a higher priority, but may be
+backfilled (EASY backfill) if it fits now and ends before the blocked highest-priority
+job could start.
+
+Assumptions:
+  - every job runs until its time limit (real jobs often end earlier)
+  - only our own job is backfilled, other pending jobs start strictly in order
+  - a pending job needs N_NODES nodes with GPUS_PER_NODE free GPUs each
+  - GPUs on 'alloc' nodes that no visible job accounts for are freed after 24h
+
+Each job start and GPU release is one heap operation and nodes are bucketed by their
+number of free GPUs, so a simulation takes O((jobs + nodes) log n).
+
+Examples
+--------
+# When would a 2 node x 8 GPU job for 4 hours start on the gpu partition?
+estimate_start --n_nodes 2 --n_gpu 8 --time 04:00:00 --partition gpu
+
+# Compare the simulated start of our pending jobs with `squeue --start`
+estimate_start --compare
+"""
+
+from __future__ import annotations
+import argparse
+import getpass
+import heapq
+import itertools
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from slurm_tools.daemon import forwarded
+from slurm_tools.slurm_time_until_start import (
+    Job,
+    fmt_duration,
+    parse_slurm_time,
+    read_jobs,
+    read_nodes,
+)
+
+INFINITE_S = 10**12
+UNKNOWN_RELEASE_S = 86400
+SELF_ID = "<this job>"
+
+
+@dataclass
+class SimJob:
+    jobid: str
+    priority: float
+    n_nodes: int
+    gpus_per_node: int
+    limit_s: int
+
+
+class _FreeGpus:
+    """Free GPUs per node, with nodes bucketed by their number of free GPUs."""
+
+    def __init__(self, free: Dict[str, int], max_gpus: int):
+        self.free = dict(free)
+        self.max_gpus = max_gpus
+        self.buckets: List[set] = [set() for _ in range(self.max_gpus + 1)]
+        for node, g in self.free.items():
+            self.buckets[g].add(node)
+
+    def change(self, node: str, delta: int):
+        g = self.free[node]
+        self.buckets[g].discard(node)
+        g = min(max(g + delta, 0), self.max_gpus)
+        self.free[node] = g
+        self.buckets[g].add(node)
+
+    def fits(self, n_nodes: int, gpus: int) -> bool:
+        return sum(len(b) for b in self.buckets[gpus:]) >= n_nodes
+
+    def take(self, n_nodes: int, gpus: int) -> Optional[List[str]]:
+        """Allocate gpus on each of n_nodes nodes, or return None if impossible now."""
+        if gpus > self.max_gpus or not self.fits(n_nodes, gpus):
+            return None
+        nodes: List[str] = []
+        # Prefer the fullest nodes that still fit, to keep large holes for big jobs
+        for g in range(gpus, self.max_gpus + 1):
+            nodes.extend(itertools.islice(self.buckets[g], n_nodes - len(nodes)))
+            if len(nodes) == n_nodes:
+                break
+        for node in nodes:
+            self.change(node, -gpus)
+        return nodes
+
+
+def shadow_time(job: SimJob, t: int, free: _FreeGpus, releases: list) -> int:
+    """Earliest time >= t at which job fits, considering only the scheduled releases."""
+    if free.fits(job.n_nodes, job.gpus_per_node):
+        return t
+    n_fitting = sum(len(b) for b in free.buckets[job.gpus_per_node :])
+    released: Dict[str, int] = {}
+    upcoming = list(releases)  # a copy is still a valid heap
+    while upcoming:
+        t_release, n, g = heapq.heappop(upcoming)
+        before = min(free.free[n] + released.get(n, 0), free.max_gpus)
+        released[n] = released.get(n, 0) + g
+        if before < job.gpus_per_node <= free.free[n] + released[n]:
+            n_fitting += 1
+            if n_fitting >= job.n_nodes:
+                return t_release
+    return INFINITE_S
+
+
+def simulate(
+    running: List[Job],
+    pending: List[SimJob],
+    node_totals: Dict[str, int],
+    node_states: Dict[str, str],
+    until: Optional[str] = None,
+    backfill: Optional[str] = None,
+) -> Dict[str, int]:
+    """Return jobid -> predicted seconds until start for the pending jobs.
+    Jobs that can never start on these nodes get INFINITE_S.
+    If until is given, the simulation stops once that job has started.
+    The job with id backfill may start out of order if it does not delay the first
+    blocked job.
+    """
+    used = {n: 0 for n in node_totals}
+    releases = []  # heap of (time, node, gpus)
+    for j in running:
+        for n in j.nodes:
+            if n in used and j.gpus_per_node > 0:
+                used[n] += j.gpus_per_node
+                releases.append((j.remaining_s, n, j.gpus_per_node))
+    for n, total in node_totals.items():
+        state = node_states.get(n, "alloc")
+        if state == "idle":
+            used[n] = 0
+        elif state == "alloc" and used[n] < total:
+            releases.append((UNKNOWN_RELEASE_S, n, total - used[n]))
+            used[n] = total
+    heapq.heapify(releases)
+    capacity = sorted(node_totals.values(), reverse=True)
+    free = _FreeGpus(
+        {n: max(t - used[n], 0) for n, t in node_totals.items()},
+        max_gpus=capacity[0] if capacity else 0,
+    )
+
+    # Highest priority first, earlier entries first among equal priorities
+    queue = deque(sorted(pending, key=lambda j: -j.priority))
+    bf_job = next((j for j in pending if j.jobid == backfill), None)
+    starts: Dict[str, int] = {}
+    t = 0
+    while queue:
+        while queue:
+            job = queue[0]
+            fits_ever = job.n_nodes <= len(capacity) and (
+                capacity[job.n_nodes - 1] >= job.gpus_per_node
+            )
+            if not fits_ever:
+                starts[job.jobid] = INFINITE_S
+                queue.popleft()
+                continue
+            nodes = free.take(job.n_nodes, job.gpus_per_node)
+            if nodes is None:
+                break
+            queue.popleft()
+            starts[job.jobid] = t
+            if job is bf_job:
+                bf_job = None
+            for n in nodes:
+                heapq.heappush(releases, (t + job.limit_s, n, job.gpus_per_node))
+            if job.jobid == until:
+                return starts
+        if not queue:
+            break
+        if (
+            bf_job is not None
+            and bf_job is not queue[0]
+            and free.fits(bf_job.n_nodes, bf_job.gpus_per_node)
+            and t + bf_job.limit_s <= shadow_time(queue[0], t, free, releases)
+        ):
+            nodes = free.take(bf_job.n_nodes, bf_job.gpus_per_node)
+            queue.remove(bf_job)
+            starts[bf_job.jobid] = t
+            for n in nodes:
+                heapq.heappush(releases, (t + bf_job.limit_s, n, bf_job.gpus_per_node))
+            if bf_job.jobid == until:
+                return starts
+            bf_job = None
+            continue
+        if not releases:
+            for job in queue:
+                starts[job.jobid] = INFINITE_S
+            break
+        t = releases[0][0]
+        while releases and releases[0][0] == t:
+            _, n, g = heapq.heappop(releases)
+            free.change(n, g)
+    return starts
+
+
+def _in_partition(job_partition: str, partition: Optional[str]) -> bool:
+    return partition is None or partition in job_partition.split(",")
+
+
+def read_queue(partition: Optional[str]):
+    """Return (running, pending, node_totals, node_states) for the partition."""
+    from slurm_tools.cluster_snapshot import get_snapshot
+
+    node_totals, _, node_states = read_nodes(partition, [])
+    running = read_jobs(consider_cg=False)
+    pending = [
+        SimJob(
+            jobid=j.jobid,
+            priority=j.priority,
+            n_nodes=j.n_nodes,
+            gpus_per_node=j.gpus_per_node,
+            limit_s=j.limit_s,
+        )
+        for j in get_snapshot().jobs
+        if j.state == "PD" and _in_partition(j.partition, partition)
+    ]
+    return running, pending, node_totals, node_states
+
+
+def estimate_start(
+    n_gpu: int,
+    n_nodes: int,
+    time_s: int,
+    partition: Optional[str] = None,
+    priority: Optional[float] = None,
+) -> int:
+    """Predicted seconds until a new job of this shape would start.
+    Without a priority, the job is queued behind every pending job.
+    """
+    running, pending, node_totals, node_states = read_queue(partition)
+    me = SimJob(
+        jobid=SELF_ID,
+        priority=float("-inf") if priority is None else priority,
+        n_nodes=n_nodes,
+        gpus_per_node=n_gpu,
+        limit_s=time_s,
+    )
+    starts = simulate(
+        running,
+        pending + [me],
+        node_totals,
+        node_states,
+        until=SELF_ID,
+        backfill=SELF_ID,
+    )
+    return starts[SELF_ID]
+
+
+def squeue_start_estimates(user: str) -> Dict[str, Optional[int]]:
+    """jobid -> seconds until start as predicted by `squeue --start` (None if N/A)."""
+    out = subprocess.check_output(
+        ["squeue", "--start", "-h", "-t", "PD", "-u", user, "-o", "%i|%S"], text=True
+    )
+    now = datetime.now()
+    estimates: Dict[str, Optional[int]] = {}
+    for line in out.strip().splitlines():
+        jobid, start = (x.strip() for x in line.split("|"))
+        try:
+            estimates[jobid] = max(
+                int((datetime.fromisoformat(start) - now).total_seconds()), 0
+            )
+        except ValueError:
+            estimates[jobid] = None
+    return estimates
+
+
+def compare_with_squeue(partition: Optional[str] = None):
+    """Print the simulated start of our pending jobs next to `squeue --start`."""
+    user = getpass.getuser()
+    running, pending, node_totals, node_states = read_queue(partition)
+    starts = simulate(running, pending, node_totals, node_states)
+    estimates = squeue_start_estimates(user)
+    if not estimates:
+        print("No pending jobs.")
+        return
+    print(f"{'JOBID':<12} {'SIMULATED':>14} {'SQUEUE --start':>16}")
+    for jobid, estimate in estimates.items():
+        simulated = starts.get(jobid)
+        sim_str = "n/a" if simulated is None else fmt_duration(simulated)
+        if simulated is not None and simulated >= INFINITE_S:
+            sim_str = "never"
+        est_str = "N/A" if estimate is None else fmt_duration(estimate)
+        print(f"{jobid:<12} {sim_str:>14} {est_str:>16}")
+
+
+@forwarded
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    ap.add_argument("--n_gpu", type=int, default=1, help="GPUs per node")
+    ap.add_argument("--n_nodes", type=int, default=1, help="Number of nodes")
+    ap.add_argument("--time", type=str, default="00:10:00", help="Time limit")
+    ap.add_argument("--partition", type=str, default=None)
+    ap.add_argument(
+        "--priority",
+        type=float,
+        default=None,
+        help="Priority of the job (default: behind all pending jobs)",
+    )
+    ap.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare simulated start times of our pending jobs with squeue --start",
+    )
+    args = ap.parse_args()
+
+    if args.compare:
+        compare_with_squeue(args.partition)
+        return
+
+    seconds = estimate_start(
+        args.n_gpu,
+        args.n_nodes,
+        parse_slurm_time(args.time),
+        partition=args.partition,
+        priority=args.priority,
+    )
+    if seconds >= INFINITE_S:
+        print("❌ The job can never start on the nodes of this partition.")
+    elif seconds == 0:
+        print("✅ The job would start now.")
+    else:
+        print(f"⏳ Predicted wait: {fmt_duration(seconds)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Shared, cached view of the cluster built from a single squeue and a single sinfo call.
+
+`squeue --json`/`sinfo --json` are used when the installed Slurm supports them, with a
+fallback to pipe-delimited output formats. The parsed snapshot is cached on disk
+(~/.cache/slurm_tools/cluster_snapshot.json) and in memory, so that repeated
+invocations within the TTL do not query slurmctld again. The TTL defaults to 30 seconds
+and can be changed with the SLURM_TOOLS_SNAPSHOT_TTL environment variable.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from slurm_tools.slurm_time_until_start import (
+    _parse_gpu_total_from_gres,
+    expand_nodelist,
+    parse_scontrol_nodes,
+    parse_slurm_time,
+    run,
+)
+from slurm_tools.util import cache_dir, write_json_atomic
+
+DEFAULT_TTL = float(os.environ.get("SLURM_TOOLS_SNAPSHOT_TTL", 30))
+# Node hardware rarely changes, so the GPU table is kept for a day
+GPU_TABLE_TTL = float(os.environ.get("SLURM_TOOLS_GPU_TABLE_TTL", 86400))
+INFINITE_S = 10**12
+
+JOB_STATES = {
+    "RUNNING": "R",
+    "PENDING": "PD",
+    "COMPLETING": "CG",
+    "CONFIGURING": "CF",
+    "SUSPENDED": "S",
+    "COMPLETED": "CD",
+    "CANCELLED": "CA",
+    "FAILED": "F",
+    "TIMEOUT": "TO",
+    "PREEMPTED": "PR",
+    "NODE_FAIL": "NF",
+    "OUT_OF_MEMORY": "OOM",
+}
+
+NODE_STATES = {
+    "IDLE": "idle",
+    "MIXED": "mix",
+    "ALLOCATED": "alloc",
+    "COMPLETING": "comp",
+    "DOWN": "down",
+    "DRAINED": "drain",
+    "DRAINING": "drng",
+    "RESERVED": "resv",
+    "PLANNED": "plnd",
+    "FUTURE": "futr",
+    "UNKNOWN": "unk",
+}
+
+_SQUEUE_FMT = "%i|%u|%t|%P|%Q|%M|%l|%D|%b|%N|%r|%j"
+_SINFO_FMT = "%N|%G|%P|%t"
+
+
+@dataclass
+class JobRecord:
+    jobid: str
+    user: str
+    state: str  # short squeue state code (R, PD, CG, ...)
+    partition: str
+    priority: int
+    elapsed_s: int
+    limit_s: int
+    n_nodes: int
+    gpus_per_node: int
+    nodelist: str
+    reason: str
+    name: str
+
+    @property
+    def nodes(self) -> List[str]:
+        return expand_nodelist(self.nodelist)
+
+
+@dataclass
+class NodeRecord:
+    name: str
+    gres: str
+    partitions: List[str]
+    state: str  # short sinfo state (idle, mix, alloc-, drain, ...)
+
+    @property
+    def total_gpus(self) -> int:
+        return _parse_gpu_total_from_gres(self.gres)
+
+
+@dataclass
+class ClusterSnapshot:
+    taken_at: float
+    jobs: List[JobRecord] = field(default_factory=list)
+    nodes: List[NodeRecord] = field(default_factory=list)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.taken_at
+
+    def jobs_of(self, user: str) -> List[JobRecord]:
+        return [j for j in self.jobs if j.user == user]
+
+    def job(self, jobid: str) -> Optional[JobRecord]:
+        for j in self.jobs:
+            if j.jobid == str(jobid):
+                return j
+        return None
+
+
+# ---------- JSON parsing ----------
+
+
+def _num(v, default=0):
+    """Unwrap Slurm >= 23.02 numbers of the form {"set": .., "infinite": .., "number": ..}."""
+    if isinstance(v, dict):
+        if v.get("infinite"):
+            return None
+        if not v.get("set", True):
+            return default
+        v = v.get("number", default)
+    return default if v is None else v
+
+
+def _first(v) -> str:
+    if isinstance(v, list):
+        return v[0] if v else ""
+    return v or ""
+
+
+def _gpus_from_tres(tres: str) -> int:
+    # Accept gres/gpu:4, gres:gpu:h200:4 and gpu:4
+    return _parse_gpu_total_from_gres((tres or "").replace("gres/", ""))
+
+
+def _job_from_json(j: dict, now: float) -> JobRecord:
+    state = JOB_STATES.get(_first(j.get("job_state")).upper(), "")
+    start = _num(j.get("start_time"))
+    elapsed = int(now - start) if state in {"R", "CG"} and start else 0
+    limit_min = _num(j.get("time_limit"))
+    return JobRecord(
+        jobid=str(j.get("job_id")),
+        user=j.get("user_name", ""),
+        state=state,
+        partition=j.get("partition", ""),
+        priority=int(_num(j.get("priority")) or 0),
+        elapsed_s=max(elapsed, 0),
+        limit_s=INFINITE_S if limit_min is None else int(limit_min) * 60,
+        n_nodes=int(_num(j.get("node_count"), 1) or 1),
+        gpus_per_node=_gpus_from_tres(j.get("tres_per_node", "")),
+        nodelist=j.get("nodes", "") or "",
+        reason=j.get("state_reason", "") or "",
+        name=j.get("name", ""),
+    )
+
+
+def _node_state(state, flags=()) -> str:
+    if isinstance(state, list):
+        state, flags = (state[0] if state else "UNKNOWN"), state[1:]
+    base = NODE_STATES.get(str(state).upper(), str(state).lower())
+    flags = {f.upper() for f in flags}
+    if "DRAIN" in flags:
+        return "drain" if base == "idle" else "drng"
+    if "MAINTENANCE" in flags or "RESERVED" in flags:
+        return "maint" if "MAINTENANCE" in flags else "resv"
+    if "NOT_RESPONDING" in flags:
+        return base + "*"
+    if "POWERED_DOWN" in flags:
+        return base + "~"
+    if "POWERING_UP" in flags:
+        return base + "#"
+    if "PLANNED" in flags:
+        return base + "-"
+    return base
+
+
+def _nodes_from_json(data: dict) -> List[NodeRecord]:
+    nodes = {}
+
+    def add(name, gres, partitions, state):
+        if name in nodes:
+            nodes[name].partitions.extend(
+                p for p in partitions if p not in nodes[name].partitions
+            )
+        else:
+            nodes[name] = NodeRecord(name, gres or "", list(partitions), state)
+
+    if "sinfo" in data:
+        # Slurm >= 23.11: one entry per (partition, state, ...) group
+        for entry in data["sinfo"]:
+            gres = entry.get("gres", {})
+            gres = gres.get("total", "") if isinstance(gres, dict) else gres
+            partition = entry.get("partition", {}).get("name", "")
+            state = _node_state(entry.get("node", {}).get("state", []))
+            for name in entry.get("nodes", {}).get("nodes", []):
+                add(name, gres, [partition] if partition else [], state)
+    else:
+        for node in data.get("nodes", []):
+            state = _node_state(node.get("state", ""), node.get("state_flags", []))
+            add(node["name"], node.get("gres", ""), node.get("partitions", []), state)
+    return list(nodes.values())
+
+
+def _run_json(cmd: List[str]) -> Optional[dict]:
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        return json.loads(out)
+    except (OSError, subprocess.CalledProcessError, json.JSONDecodeError):
+        return None
+
+
+# ---------- Pipe-delimited fallback ----------
+
+
+def _jobs_from_pipe(out: str) -> List[JobRecord]:
+    jobs = []
+    for line in out.strip().splitlines():
+        cols = line.split("|", _SQUEUE_FMT.count("|"))
+        if len(cols) != _SQUEUE_FMT.count("|") + 1:
+            continue
+        jobid, user, state, part, prio, elapsed, limit, n_nodes, tres, nodelist = (
+            x.strip() for x in cols[:10]
+        )
+        jobs.append(
+            JobRecord(
+                jobid=jobid,
+                user=user,
+                state=state,
+                partition=part,
+                priority=int(prio) if prio.isdigit() else 0,
+                elapsed_s=parse_slurm_time(elapsed),
+                limit_s=parse_slurm_time(limit),
+                n_nodes=int(n_nodes) if n_nodes.isdigit() else 1,
+                gpus_per_node=_gpus_from_tres(tres),
+                nodelist=nodelist,
+                reason=cols[10].strip(),
+                name=cols[11].strip(),
+            )
+        )
+    return jobs
+
+
+def _nodes_from_pipe(out: str) -> List[NodeRecord]:
+    nodes = {}
+    for line in out.strip().splitlines():
+        if not line.strip():
+            continue
+        name, gres, part, state = (x.strip() for x in line.split("|"))
+        partitions = [p.rstrip("*") for p in part.split(",")]
+        if name in nodes:
+            nodes[name].partitions.extend(
+                p for p in partitions if p not in nodes[name].partitions
+            )
+        else:
+            nodes[name] = NodeRecord(name, gres, partitions, state)
+    return list(nodes.values())
+
+
+# ---------- Snapshot ----------
+
+
+def read_cluster() -> ClusterSnapshot:
+    """Query squeue and sinfo once each and parse them into a snapshot."""
+    now = time.time()
+    data = _run_json(["squeue", "--json"])
+    if data is not None and "jobs" in data:
+        jobs = [_job_from_json(j, now) for j in data["jobs"]]
+    else:
+        jobs = _jobs_from_pipe(run(["squeue", "-h", "-o", _SQUEUE_FMT]))
+
+    data = _run_json(["sinfo", "--json"])
+    if data is not None and ("sinfo" in data or "nodes" in data):
+        nodes = _nodes_from_json(data)
+    else:
+        nodes = _nodes_from_pipe(run(["sinfo", "-h", "-N", "-o", _SINFO_FMT]))
+    return ClusterSnapshot(taken_at=now, jobs=jobs, nodes=nodes)
+
+
+def _cache_path() -> str:
+    return os.path.join(cache_dir(), "cluster_snapshot.json")
+
+
+def _load_cache() -> Optional[ClusterSnapshot]:
+    try:
+        with open(_cache_path(), "r") as file:
+            data = json.load(file)
+        return ClusterSnapshot(
+            taken_at=data["taken_at"],
+            jobs=[JobRecord(**j) for j in data["jobs"]],
+            nodes=[NodeRecord(**n) for n in data["nodes"]],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+_memo: Optional[ClusterSnapshot] = None
+
+
+def get_snapshot(ttl: float = DEFAULT_TTL, refresh: bool = False) -> ClusterSnapshot:
+    """Return a snapshot that is at most ttl seconds old, querying Slurm only if needed."""
+    global _memo
+    if not refresh:
+        if _memo is not None and _memo.age <= ttl:
+            return _memo
+        cached = _load_cache()
+        if cached is not None and cached.age <= ttl:
+            _memo = cached
+            return cached
+    _memo = read_cluster()
+    try:
+        write_json_atomic(_cache_path(), asdict(_memo))
+    except OSError:
+        pass
+    return _memo
+
+
+_gpu_table_memo: Optional[dict] = None
+
+
+def node_gpu_table(ttl: float = GPU_TABLE_TTL, refresh: bool = False) -> Dict[str, int]:
+    """Return node -> total GPUs from a single `scontrol show node --oneliner` call.
+    The table is cached on disk for ttl seconds.
+    """
+    global _gpu_table_memo
+    path = os.path.join(cache_dir(), "node_gpus.json")
+    if not refresh:
+        data = _gpu_table_memo
+        if data is None:
+            try:
+                with open(path, "r") as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                data = None
+        if data is not None and time.time() - data["taken_at"] <= ttl:
+            _gpu_table_memo = data
+            return data["gpus"]
+    gpus = parse_scontrol_nodes(run(["scontrol", "show", "node", "--oneliner"]))
+    _gpu_table_memo = {"taken_at": time.time(), "gpus": gpus}
+    try:
+        write_json_atomic(path, _gpu_table_memo)
+    except OSError:
+        pass
+    return gpus
+
+
+# ---------- Accounting ----------
+
+# Keep sacct command lines well below ARG_MAX
+_SACCT_BATCH = 2000
+_ARRAY_TASKS_RE = re.compile(r"^(\d+)_\[(.*)\]$")
+
+
+def _expand_array_tasks(jobid: str) -> List[str]:
+    """123_[1-3,7%2] -> 123_1, 123_2, 123_3, 123_7"""
+    m = _ARRAY_TASKS_RE.match(jobid)
+    if m is None:
+        return [jobid]
+    base, spec = m.group(1), m.group(2).split("%")[0]
+    tasks = []
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        tasks.extend(f"{base}_{i}" for i in range(int(lo), int(hi or lo) + 1))
+    return tasks
+
+
+@dataclass
+class AccountingRecord:
+    jobid: str
+    state: str  # COMPLETED, FAILED, TIMEOUT, RUNNING, ...
+    exit_code: str  # <exit code>:<signal>
+    elapsed_s: int
+
+
+def job_accounting(job_ids: List[str]) -> Dict[str, AccountingRecord]:
+    """Return jobid -> accounting record from sacct.
+    Array tasks are reported as <jobid>_<task>. All jobs are queried in one sacct call
+    (per batch of 2000 job IDs). Jobs unknown to sacct are missing from the result.
+    """
+    base_ids = sorted({str(j).split("_")[0] for j in job_ids})
+    records: Dict[str, AccountingRecord] = {}
+    for i in range(0, len(base_ids), _SACCT_BATCH):
+        out = run(
+            [
+                "sacct",
+                "-n",
+                "-P",
+                "-X",
+                "-j",
+                ",".join(base_ids[i : i + _SACCT_BATCH]),
+                "-o",
+                "JobID,State,ExitCode,Elapsed",
+            ]
+        )
+        for line in out.strip().splitlines():
+            cols = [c.strip() for c in line.split("|")]
+            jobid, state = cols[0], cols[1] if len(cols) > 1 else ""
+            # "CANCELLED by 1234" -> "CANCELLED"
+            state = state.split(" ")[0].rstrip("+")
+            exit_code = cols[2] if len(cols) > 2 else ""
+            elapsed = parse_slurm_time(cols[3]) if len(cols) > 3 else 0
+            for task_id in _expand_array_tasks(jobid):
+                records[task_id] = AccountingRecord(task_id, state, exit_code, elapsed)
+    return records
+
+
+def job_states(job_ids: List[str]) -> Dict[str, str]:
+    """Return jobid -> accounting state (COMPLETED, FAILED, TIMEOUT, ...) from sacct."""
+    return {jobid: r.state for jobid, r in job_accounting(job_ids).items()}
@@ -0,0 +1,454 @@
+"""
+Optional long-lived daemon that runs the command line tools without starting Python.
+
+`slurm_tools_daemon start` starts a daemon listening on a Unix socket in
+~/.cache/slurm_tools. It imports all tools once and keeps the cluster snapshot and the
+run index in memory. While it is running, the console scripts in COMMANDS forward
+their arguments, working directory, environment and stdin/stdout/stderr to the daemon,
+which runs the command in a forked child. Signals like Ctrl-C are passed on to the
+child. Without a running daemon, or with SLURM_TOOLS_NO_DAEMON=1, the commands run in
+process as usual.
+
+The snapshot is refreshed in the background while the daemon is used, so at most one
+squeue/sinfo call per TTL is made for all commands. The daemon exits after
+--idle_timeout seconds without requests. Restart it after updating slurm_tools.
+
+Examples
+--------
+slurm_tools_daemon start
+slurm_tools_daemon status
+slurm_tools_daemon stop
+"""
+import os
+import sys
+
+from slurm_tools.util import cache_dir
+
+# Commands that may be forwarded to the daemon. attach is interactive and always runs
+# in process.
+COMMANDS = {
+    "slurm_job": "slurm_tools.do_slurm_job",
+    "param_sweep": "slurm_tools.param_sweep",
+    "monitor_run": "slurm_tools.monitor_newest_slurm_run",
+    "redo": "slurm_tools.redo",
+    "sglang_job": "slurm_tools.start_sglang",
+    "reindex": "slurm_tools.run_index",
+    "estimate_start": "slurm_tools.backfill_sim",
+    "script_users": "slurm_tools.script_store",
+    "sweep_status": "slurm_tools.sweep_status",
+    "runs_grep": "slurm_tools.runs_grep",
+}
+# Imported once by the daemon in addition to COMMANDS, so that children don't have to
+PRELOAD = [
+    "yaml",
+    "json",
+    "subprocess",
+    "concurrent.futures",
+    "slurm_tools.cluster_snapshot",
+    "slurm_tools.sweep_strategies",
+    "slurm_tools.templates",
+]
+# Keep the snapshot fresh for this long after the last request
+KEEP_WARM_S = 300
+
+# Set in the children of the daemon, so that commands run in process there
+_serving = False
+
+
+def socket_path() -> str:
+    """Socket of the daemon on this host. Home directories are often shared by all login
+    nodes, so the host name is part of the path.
+    """
+    path = os.environ.get("SLURM_TOOLS_DAEMON_SOCKET")
+    if path:
+        return path
+    host = os.uname().nodename
+    path = os.path.join(cache_dir(), f"daemon-{host}.sock")
+    if len(path) > 100:  # sun_path is limited to 108 bytes
+        import tempfile
+
+        path = os.path.join(
+            tempfile.gettempdir(), f"slurm_tools-{os.getuid()}-{host}.sock"
+        )
+    return path
+
+
+# ---------- Client ----------
+
+
+def _connect():
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _request(sock, message: dict):
+    import json
+
+    sock.sendall((json.dumps(message) + "\n").encode())
+    return sock.makefile("r")
+
+
+def forward(command: str, argv: list[str]) -> int | None:
+    """Run command on the daemon with this process' stdio, cwd and environment.
+    Returns the exit code, or None if no daemon is running.
+    """
+    import json
+    import signal
+    import socket
+
+    try:
+        for fd in (0, 1, 2):
+            os.fstat(fd)
+    except OSError:
+        return None
+    sock = _connect()
+    if sock is None:
+        return None
+    request = dict(
+        command=command,
+        argv=argv,
+        cwd=os.getcwd(),
+        env=dict(os.environ),
+        umask=os.umask(0o022),
+    )
+    os.umask(request["umask"])
+    data = (json.dumps(request) + "\n").encode()
+    with sock:
+        try:
+            sent = socket.send_fds(sock, [data], [0, 1, 2])
+            sock.sendall(data[sent:])
+            replies = sock.makefile("r")
+            pid = json.loads(replies.readline())["pid"]
+        except (OSError, ValueError, KeyError):
+            return None  # nothing was run yet
+
+        def pass_on(signum, frame):
+            try:
+                os.killpg(pid, signum)
+            except ProcessLookupError:
+                pass
+
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(signum, pass_on)
+        try:
+            return json.loads(replies.readline())["exit_code"]
+        except (OSError, ValueError, KeyError):
+            print("❌ Lost the connection to the slurm_tools daemon.", file=sys.stderr)
+            return 1
+
+
+def forwarded(main):
+    """Decorator for the main() of a console script in COMMANDS. Runs it on the daemon
+    if one is running, otherwise in process.
+    """
+    import functools
+
+    names = [name for name, module in COMMANDS.items() if module == main.__module__]
+
+    @functools.wraps(main)
+    def wrapper():
+        if (
+            not _serving
+            and names
+            and not os.environ.get("SLURM_TOOLS_NO_DAEMON")
+            and os.path.exists(socket_path())
+        ):
+            exit_code = forward(names[0], sys.argv[1:])
+            if exit_code is not None:
+                sys.exit(exit_code)
+        return main()
+
+    return wrapper
+
+
+# ---------- Daemon ----------
+
+
+def _run_child(conn, fds: list[int], request: dict):
+    """Body of the forked child: take over the client's stdio and run its command."""
+    import importlib
+    import json
+    import signal
+    import traceback
+
+    global _serving
+    _serving = True
+    os.setpgid(0, 0)
+    # The client forwards signals to this process group
+    conn.sendall((json.dumps(dict(pid=os.getpid())) + "\n").encode())
+    for signum in (signal.SIGTERM, signal.SIGHUP, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = os.fdopen(0, "r", closefd=False)
+    sys.stdout = os.fdopen(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = os.fdopen(2, "w", buffering=1, closefd=False)
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.umask(request["umask"])
+    sys.argv = [request["command"], *request["argv"]]
+
+    exit_code = 0
+    try:
+        os.chdir(request["cwd"])
+        importlib.import_module(COMMANDS[request["command"]]).main()
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except KeyboardInterrupt:
+        exit_code = 130
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except OSError:
+        pass
+    try:
+        conn.sendall((json.dumps(dict(exit_code=exit_code)) + "\n").encode())
+    except OSError:
+        pass
+    os._exit(exit_code)
+
+
+class Daemon:
+    def __init__(self, path: str, idle_timeout: float):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.started_at = self.last_request = self.last_refresh = 0.0
+        self.n_requests = 0
+        self.dest_dir = os.path.join(os.environ["HOME"], "runs")
+        self.server = None
+
+    def preload(self):
+        import importlib
+
+        for module in [*PRELOAD, *COMMANDS.values()]:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                print(f"Could not preload {module}: {e}", flush=True)
+
+    def warm(self, snapshot: bool):
+        """Read lines appended to the run index and refresh a stale snapshot."""
+        import time
+
+        from slurm_tools import cluster_snapshot, run_index
+        from slurm_tools.slurm_time_until_start import EstimatorError
+
+        run_index.warm(self.dest_dir)
+        if (
+            not snapshot
+            or time.time() - self.last_refresh < cluster_snapshot.DEFAULT_TTL
+        ):
+            return
+        # A failed refresh is only retried after the TTL
+        self.last_refresh = time.time()
+        try:
+            cluster_snapshot.get_snapshot()
+            cluster_snapshot.node_gpu_table()
+        except (EstimatorError, OSError) as e:
+            print(f"Could not refresh the cluster snapshot: {e}", flush=True)
+
+    def status(self) -> dict:
+        import time
+
+        from slurm_tools import __version__, cluster_snapshot
+
+        memo = cluster_snapshot._memo
+        return dict(
+            pid=os.getpid(),
+            version=__version__,
+            uptime_s=time.time() - self.started_at,
+            requests=self.n_requests,
+            snapshot_age_s=None if memo is None else memo.age,
+        )
+
+    def handle(self, conn) -> bool:
+        """Serve one connection. Returns False if the daemon should stop."""
+        import json
+        import socket
+        import struct
+
+        _, uid, _ = struct.unpack(
+            "3i", conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, 12)
+        )
+        if uid != os.getuid():
+            return True
+        data, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+        try:
+            while not data.endswith(b"\n"):
+                chunk = conn.recv(1 << 16)
+                if not chunk:
+                    return True
+                data += chunk
+            request = json.loads(data)
+            command = request["command"]
+            if command == "__status__":
+                conn.sendall((json.dumps(self.status()) + "\n").encode())
+                return True
+            if command == "__stop__":
+                conn.sendall(b"{}\n")
+                return False
+            if command not in COMMANDS or len(fds) != 3:
+                return True
+
+            self.n_requests += 1
+            self.warm(snapshot=False)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                self.server.close()
+                _run_child(conn, fds, request)
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Bad request: {e}", flush=True)
+            return True
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def serve(self):
+        import signal
+        import socket
+        import time
+
+        from slurm_tools import run_index
+
+        self.preload()
+        # Children are reaped automatically
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.started_at = self.last_request = time.time()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(64)
+        server.settimeout(1)
+        print(f"Listening on {self.path} (pid {os.getpid()})", flush=True)
+        try:
+            if os.path.exists(run_index.index_path(self.dest_dir)):
+                run_index.warm(self.dest_dir)
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    idle = time.time() - self.last_request
+                    if idle > self.idle_timeout:
+                        print("Stopping after being idle.", flush=True)
+                        return
+                    self.warm(snapshot=idle < KEEP_WARM_S)
+                    continue
+                self.last_request = time.time()
+                with conn:
+                    conn.settimeout(10)
+                    if not self.handle(conn):
+                        return
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+# ---------- Command line ----------
+
+
+def _query(command: str) -> dict | None:
+    import json
+
+    sock = _connect()
+    if sock is None:
+        return None
+    with sock:
+        try:
+            return json.loads(_request(sock, dict(command=command)).readline())
+        except (OSError, ValueError):
+            return None
+
+
+def start(idle_timeout: float):
+    import subprocess
+    import time
+
+    if _query("__status__") is not None:
+        print(f"✅ The daemon is already running on {socket_path()}")
+        return
+    log_path = os.path.join(cache_dir(), "daemon.log")
+    with open(log_path, "a") as log:
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "slurm_tools.daemon",
+                "serve",
+                "--idle_timeout",
+                str(idle_timeout),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            env={**os.environ, "SLURM_TOOLS_NO_DAEMON": "1"},
+        )
+    for _ in range(100):
+        time.sleep(0.1)
+        if _query("__status__") is not None:
+            print(f"✅ Started the daemon on {socket_path()}")
+            return
+    print(f"❌ The daemon did not start, see {log_path}")
+    sys.exit(1)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("action", choices=["start", "stop", "status", "serve"])
+    parser.add_argument(
+        "--idle_timeout",
+        type=float,
+        default=3600,
+        help="Stop after this many seconds without requests.",
+    )
+    args = parser.parse_args()
+
+    if args.action == "serve":
+        Daemon(socket_path(), args.idle_timeout).serve()
+    elif args.action == "start":
+        start(args.idle_timeout)
+    elif args.action == "stop":
+        if _query("__stop__") is None:
+            print("⏳ The daemon is not running.")
+        else:
+            print("✅ Stopped the daemon.")
+    else:
+        status = _query("__status__")
+        if status is None:
+            print("⏳ The daemon is not running.")
+            return
+        age = status["snapshot_age_s"]
+        print(
+            f"✅ Daemon {status['version']} running on {socket_path()} "
+            f"(pid {status['pid']}, up {status['uptime_s']:.0f}s, "
+            f"{status['requests']} requests, snapshot age "
+            f"{'-' if age is None else f'{age:.0f}s'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,22 @@
 import argparse
 import os
-import subprocess
-from datetime import datetime
-from slurm_tools.slurm_time_until_start import find_n_gpu, find_n_nodes
+from slurm_tools.daemon import forwarded
+from slurm_tools.run_index import add_job_dir
+from slurm_tools.script_store import write_job_manifest
+from slurm_tools.submit import PendingSubmission, submit
+from slurm_tools.templates import load_template
+from slurm_tools.util import generate_local_job_id
 
 basedir = os.path.dirname(os.path.abspath(__file__))
 
 
-def generate_local_job_id():
-    """
-    Generates a local job ID based on timestamp.
-    """
-    return datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
+def runs_dir(template_file: str) -> str:
+    """Directory holding the run groups of jobs using template_file."""
+    return (
+        "/root/runs"
+        if "apptainer" in template_file
+        else os.path.join(os.environ["HOME"], "runs")
+    )
 
 
 def slurm_job(
@@ -39,8 +44,27 @@ def slurm_job(
     extra2: str,
     extra3: str,
     gpu_type: str,
+    array_params: list[str] | None = None,
+    array_limit: int = 0,
+    pack_params: list[str] | None = None,
+    submit_retries: int = 5,
+    defer_submit: bool = False,
+    dedup_scripts: bool = False,
     **_kwargs,
 ):
+    """
+    Render the slurm script for a job into its own run directory and submit it.
+    Returns the slurm job ID (None for dry runs).
+
+    If array_params is given, a single job array is submitted instead. Every line of
+    array_params is appended to the program call of the array task with the same index.
+    If pack_params is given, every line of pack_params is run with the program call inside
+    this single job, on one GPU each and as many at a time as there are GPUs (see
+    pack_runner).
+    If defer_submit is set, the PendingSubmission is returned instead of submitting it.
+    If dedup_scripts is set, the script is kept in the shared script store and the job
+    directory only gets a manifest (see slurm_tools.script_store).
+    """
     program_file = (
         program_call.split(" ")[1]
         if program_call.startswith("python ")
@@ -91,17 +115,35 @@ def slurm_job(
         print("No need to include the launcher (python) in the program call.")
         program_call = program_call.removeprefix("python ")
     job_id = generate_local_job_id()
-    dest_dir = (
-        "/root/runs"
-        if "apptainer" in template_file
-        else os.path.join(os.environ["HOME"], "runs")
-    )
+    dest_dir = runs_dir(template_file)
     job_specific_dir = os.path.join(dest_dir, run_group, job_id)
-    os.makedirs(job_specific_dir, exist_ok=True)
+    template = load_template(template_file)
 
     if n_cpu == 0:
         n_cpu = max(1, n_gpu) * 18
 
+    sbatch_args = []
+    if array_params:
+        params_path = os.path.join(job_specific_dir, "array_params.txt")
+        program_call = (
+            f"{program_call} $(sed -n $((SLURM_ARRAY_TASK_ID + 1))p {params_path})"
+        )
+        array_spec = f"0-{len(array_params) - 1}"
+        if array_limit:
+            array_spec += f"%{array_limit}"
+        log_path = os.path.join(job_specific_dir, "slurm-%x-%A_%a.out")
+        sbatch_args += [f"--array={array_spec}", "--output", log_path]
+        sbatch_args += ["--error", log_path]
+    elif pack_params:
+        if n_nodes != 1:
+            raise ValueError("Packed jobs run on a single node, use --n_nodes 1.")
+        params_path = os.path.join(job_specific_dir, "pack_points.txt")
+        program_call = (
+            f"{os.path.join(basedir, 'pack_runner.py')} --points {params_path} "
+            f"--n_gpu {n_gpu} --log_dir {job_specific_dir} -- {distribute} {program_call}"
+        )
+        distribute = "python"
+
     if extra_arg:
         extra_arg = f'--extra "{extra_arg}"'
 
@@ -131,6 +173,12 @@ def slurm_job(
         extra3=extra3,
         gpu_type=gpu_type,
     )
+    # Fail on unknown placeholders before anything is written
+    template.check(format_dict)
+    os.makedirs(job_specific_dir, exist_ok=False)
+    if array_params or pack_params:
+        with open(params_path, "w") as file:
+            file.write("\n".join(array_params or pack_params) + "\n")
 
     if keepalive:
         redos_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "redos")
@@ -148,24 +196,29 @@ def slurm_job(
                 f"cd {os.getcwd()};source ~/.condasetup_bash;conda activate {conda_env};{distribute} -u {program_call}"
             )
 
-    with open(template_file, "r") as file:
-        script = file.read().format(**format_dict)
-
-    output_path = os.path.join(job_specific_dir, "slurm_script.sh")
-    with open(output_path, "w") as file:
-        file.write(script)
-
-    if not dry:
-        if dependencies:
-            subprocess.run(
-                [
-                    "sbatch",
-                    "--dependency=afterany:" + ":".join(map(str, dependencies)),
-                    output_path,
-                ]
-            )
-        else:
-            subprocess.run(["sbatch", output_path])
+    script = template.render(format_dict)
+
+    if dedup_scripts:
+        write_job_manifest(job_specific_dir, template, format_dict)
+    else:
+        output_path = os.path.join(job_specific_dir, "slurm_script.sh")
+        with open(output_path, "w") as file:
+            file.write(script)
+        sbatch_args.append(output_path)
+
+    if dry:
+        add_job_dir(job_specific_dir)
+        return None
+    if dependencies:
+        sbatch_args.insert(
+            0, "--dependency=afterany:" + ":".join(map(str, dependencies))
+        )
+    submission = PendingSubmission(
+        job_specific_dir, sbatch_args, script=script if dedup_scripts else None
+    )
+    if defer_submit:
+        return submission
+    return submit(submission, retries=submit_retries)
 
 
 def obtain_parser():
@@ -242,20 +295,80 @@ def obtain_parser():
         "--extra3", type=str, default="", help="Extra arguments to pass to the job."
     )
     parser.add_argument("--gpu_type", type=str, default="h200", help="GPU type to use.")
+    parser.add_argument(
+        "--auto_shape",
+        action="store_true",
+        help="Choose n_nodes, n_gpu and time for the earliest predicted completion. "
+        "--time is the runtime when using all GPUs of --gpu_budget.",
+    )
+    parser.add_argument(
+        "--gpu_budget",
+        type=int,
+        default=0,
+        help="Total GPUs for --auto_shape (default: n_gpu * n_nodes).",
+    )
+    parser.add_argument(
+        "--submit_retries",
+        type=int,
+        default=5,
+        help="Retries of sbatch on transient slurmctld errors.",
+    )
+    parser.add_argument(
+        "--dedup_scripts",
+        action="store_true",
+        help="Store the script once in ~/runs/.scripts and only a manifest in the job dir.",
+    )
 
     return parser
 
 
+def auto_shape(args):
+    """Set n_nodes, n_gpu and time of args to the shape that is predicted to finish first."""
+    from slurm_tools.slurm_time_until_start import (
+        best_shape,
+        fmt_duration,
+        format_slurm_time,
+        parse_slurm_time,
+        read_jobs,
+        read_nodes,
+    )
+
+    gpu_budget = args.gpu_budget or args.n_gpu * args.n_nodes
+    node_totals, _, node_states = read_nodes(None, [])
+    jobs = read_jobs(consider_cg=False)
+    n_nodes, n_gpu, time_s, wait_s = best_shape(
+        gpu_budget, parse_slurm_time(args.time), jobs, node_totals, node_states
+    )
+    args.n_nodes, args.n_gpu, args.time = n_nodes, n_gpu, format_slurm_time(time_s)
+    print(
+        f"Auto shape: {n_nodes} node(s) x {n_gpu} GPU(s) for {args.time}, "
+        f"predicted wait {fmt_duration(wait_s)}"
+    )
+
+
+@forwarded
 def main():
     parser = obtain_parser()
     args = parser.parse_args()
+    if args.auto_shape:
+        auto_shape(args)
     slurm_job(**vars(args))
     if args.compute_time_to_start:
-        if args.n_nodes == 1:
-            deadline = find_n_gpu(args.n_gpu)
-        else:
-            deadline = find_n_nodes(args.n_nodes)
-        print(f"Estimated time to start the job: {deadline}")
+        from slurm_tools.slurm_time_until_start import (
+            EstimatorError,
+            estimate_gpus,
+            estimate_nodes,
+        )
+
+        try:
+            if args.n_nodes == 1:
+                eta = estimate_gpus(args.n_gpu)
+            else:
+                eta = estimate_nodes(args.n_nodes)
+        except EstimatorError as e:
+            print(f"❌ Could not estimate the time to start the job: {e}")
+            return
+        print(f"Estimated time to start the job: {eta}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+Follow one or more growing log files, like `tail -F`.
+
+Only newly appended bytes are read. Truncated files are re-read from the start and
+rotated files (same path, new inode) are reopened. On Linux, inotify wakes the follower
+as soon as a local write happens. Writes from other hosts on network filesystems are
+not reported by inotify, so the files are additionally polled with an interval that
+grows while nothing happens and resets once new data arrives.
+"""
+import codecs
+import ctypes
+import ctypes.util
+import itertools
+import os
+import select
+import sys
+import time
+
+from slurm_tools.util import iter_lines_reversed
+
+IN_MODIFY = 0x002
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+class FollowedFile:
+    def __init__(self, path: str, prefix: str = ""):
+        self.path = path
+        self.prefix = prefix
+        self.partial = ""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.file = None
+        self.inode = None
+        self._open(seek_end=True)
+
+    def _open(self, seek_end: bool):
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            self.file = None
+            return
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        if seek_end:
+            self.file.seek(0, os.SEEK_END)
+
+    def last_lines(self, n: int) -> list[str]:
+        if n <= 0 or not os.path.exists(self.path):
+            return []
+        lines = list(itertools.islice(iter_lines_reversed(self.path), n))
+        return [self.prefix + line + "\n" for line in reversed(lines)]
+
+    def read_new(self) -> str:
+        if self.file is None:
+            self._open(seek_end=False)
+            if self.file is None:
+                return ""
+        data = self.file.read()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_ino != self.inode:
+            # Rotated: the old file was drained above, continue with the new one
+            self.file.close()
+            self._open(seek_end=False)
+            data += self.file.read() if self.file is not None else b""
+        elif st is not None and st.st_size < self.file.tell():
+            # Truncated: start over
+            self.file.seek(0)
+            data += self.file.read()
+        return self._format(data)
+
+    def _format(self, raw: bytes) -> str:
+        data = self.decoder.decode(raw)
+        if not self.prefix or not data:
+            return data
+        lines = (self.partial + data).split("\n")
+        self.partial = lines.pop()
+        return "".join(f"{self.prefix}{line}\n" for line in lines)
+
+
+def _inotify_fd(paths: list[str]) -> int | None:
+    """Watch the directories of paths with inotify. Returns None if unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    for directory in {os.path.dirname(os.path.abspath(p)) for p in paths}:
+        libc.inotify_add_watch(fd, directory.encode(), mask)
+    return fd
+
+
+def _wait(fd: int | None, timeout: float):
+    if fd is None:
+        time.sleep(timeout)
+        return
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if ready:
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def follow(
+    paths: list[str],
+    lines: int = 10,
+    min_interval: float = 0.1,
+    max_interval: float = 1.0,
+    out=None,
+):
+    """
+    Print the last lines of every file and then stream everything appended to them.
+    Lines are prefixed with the file name when following more than one file.
+    Runs until interrupted.
+    """
+    out = out or sys.stdout
+    multiple = len(paths) > 1
+    followed = [
+        FollowedFile(p, prefix=f"[{os.path.basename(p)}] " if multiple else "")
+        for p in paths
+    ]
+    for f in followed:
+        out.write("".join(f.last_lines(lines)))
+    out.flush()
+
+    fd = _inotify_fd(paths)
+    interval = min_interval
+    try:
+        while True:
+            _wait(fd, interval)
+            new_data = False
+            for f in followed:
+                data = f.read_new()
+                if data:
+                    out.write(data)
+                    new_data = True
+            if new_data:
+                out.flush()
+                interval = min_interval
+            else:
+                interval = min(interval * 2, max_interval)
+    finally:
+        if fd is not None:
+            os.close(fd)
@@ -1,11 +1,53 @@
 import argparse
 import os
+from slurm_tools import run_index
+from slurm_tools.daemon import forwarded
 
 
+def file_predicate(
+    script: bool = False,
+    server_log: str | None = None,
+    gpu_log: str | None = None,
+    command_log: str | None = None,
+    get_file: str | None = None,
+):
+    """
+    Return a predicate on file names selecting one kind of file in a job directory.
+    An empty rank for server_log, gpu_log or command_log matches every rank.
+    Defaults to the slurm output logs.
+    """
+
+    def predicate(n):
+        if get_file:
+            return n == get_file
+        if script:
+            return n == "slurm_script.sh"
+        if server_log is not None:
+            return n.startswith("server.log") and n.endswith(
+                f".{server_log}".rstrip(".")
+            )
+        if gpu_log is not None:
+            return n.startswith("gpus") and n.endswith(f"{gpu_log}.log")
+        if command_log is not None:
+            return n.startswith("command") and n.endswith(f"{command_log}.log")
+        return n.startswith("slurm-") and n.endswith(".out")
+
+    return predicate
+
+
+@forwarded
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--watch", action="store_true", help="watch it")
-    parser.add_argument("--watchtime", type=int, default=1, help="seconds")
+    parser.add_argument(
+        "--watchtime",
+        type=float,
+        default=1,
+        help="maximum seconds between polls when watching",
+    )
+    parser.add_argument(
+        "--lines", type=int, default=20, help="lines to show before watching"
+    )
     parser.add_argument("--oldness", type=int, default=0, help="0 for newest run")
     parser.add_argument(
         "--path",
@@ -14,10 +56,36 @@ def main():
         help="where do they be areing",
     )
     parser.add_argument("--script", action="store_true")
-    parser.add_argument("--server_log", type=int, default=None)
-    parser.add_argument("--gpu_log", type=int, default=None)
-    parser.add_argument("--command_log", type=int, default=None)
+    parser.add_argument(
+        "--server_log",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        help="rank to show, leave empty for all ranks",
+    )
+    parser.add_argument(
+        "--gpu_log",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        help="rank to show, leave empty for all ranks",
+    )
+    parser.add_argument(
+        "--command_log",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        help="rank to show, leave empty for all ranks",
+    )
     parser.add_argument("--get_file", type=str, default=None)
+    parser.add_argument(
+        "--no_index",
+        action="store_true",
+        help="Walk the whole run directory instead of using the run index.",
+    )
     args = parser.parse_args()
 
     assert (
@@ -33,32 +101,53 @@ def main():
         <= 1
     )
 
-    def predicate(n):
-        if args.get_file:
-            return n == args.get_file
-        if args.script:
-            return n == "slurm_script.sh"
-        if args.server_log is not None:
-            return n.startswith("server.log") and n.endswith(f".{args.server_log}")
-        if args.gpu_log is not None:
-            return n.startswith("gpus") and n.endswith(f"{args.gpu_log}.log")
-        if args.command_log is not None:
-            return n.startswith("command") and n.endswith(f"{args.command_log}.log")
-        return n.startswith("slurm-") and n.endswith(".out")
-
-    files = sum(
-        [
-            [os.path.join(p, n) for n in f if predicate(n)]
-            for p, s, f in os.walk(args.path)
-        ],
-        [],
+    predicate = file_predicate(
+        script=args.script,
+        server_log=args.server_log,
+        gpu_log=args.gpu_log,
+        command_log=args.command_log,
+        get_file=args.get_file,
     )
-    files.sort(key=lambda x: -os.path.getmtime(x))
+    all_ranks = "" in (args.server_log, args.gpu_log, args.command_log)
+
+    if args.no_index or not os.path.exists(run_index.index_path(args.path)):
+        if not args.no_index:
+            print("No run index found, walking the run directory. Run `reindex`.")
+        files = sum(
+            [
+                [os.path.join(p, n) for n in f if predicate(n)]
+                for p, s, f in os.walk(args.path)
+            ],
+            [],
+        )
+        files.sort(key=lambda x: -os.path.getmtime(x))
+    else:
+        files = []
+        for entry in run_index.iter_entries(args.path):
+            job_dir = entry["job_dir"]
+            if not os.path.isdir(job_dir):
+                continue
+            job_files = [os.path.join(job_dir, n) for n in os.listdir(job_dir)]
+            job_files = [f for f in job_files if predicate(os.path.basename(f))]
+            files.extend(sorted(job_files, key=lambda x: -os.path.getmtime(x)))
+            if len(files) > args.oldness:
+                break
     print(files[args.oldness])
+    if all_ranks:
+        job_dir = os.path.dirname(files[args.oldness])
+        paths = sorted(os.path.join(job_dir, n) for n in os.listdir(job_dir))
+        paths = [p for p in paths if predicate(os.path.basename(p))]
+    else:
+        paths = [files[args.oldness]]
     if args.watch:
-        os.system(f"watch --color -n {args.watchtime} tac {files[args.oldness]}")
+        from slurm_tools.follow import follow
+
+        try:
+            follow(paths, lines=args.lines, max_interval=args.watchtime)
+        except KeyboardInterrupt:
+            pass
     else:
-        os.system(f"cat {files[args.oldness]}")
+        os.system(f"cat {' '.join(paths)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+Run many sweep points inside one allocation, one point per GPU at a time.
+
+Started by packed jobs of `param_sweep --pack`. Every line of the points file holds the
+arguments of one point. The points are queued and started as soon as a GPU is free,
+with CUDA_VISIBLE_DEVICES set to that GPU. The output of point i goes to
+<log_dir>/point_<i>.log and its exit code is appended to <log_dir>/pack_status.jsonl.
+The runner exits with a non-zero code if any point failed.
+
+This file is executed inside the job, so it must only use the standard library.
+
+Example (inside a job):
+python pack_runner.py --points pack_points.txt --n_gpu 4 --log_dir . -- python main.py
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def visible_gpus(n_gpu: int) -> list[str]:
+    devices = os.environ.get("CUDA_VISIBLE_DEVICES", "")
+    gpus = [d for d in devices.split(",") if d.strip()]
+    return gpus[:n_gpu] if gpus else [str(i) for i in range(n_gpu)]
+
+
+def run_points(points: list[str], command: str, gpus: list[str], log_dir: str) -> int:
+    """Run every point on a free GPU and return the number of failed points."""
+    queue = list(enumerate(points))[::-1]
+    free = list(gpus)
+    running: dict[int, tuple[subprocess.Popen, int, str, float]] = {}
+    n_failed = 0
+
+    def terminate(signum, frame):
+        for proc, *_ in running.values():
+            proc.terminate()
+        sys.exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    status_path = os.path.join(log_dir, "pack_status.jsonl")
+    while queue or running:
+        while queue and free:
+            i, point = queue.pop()
+            gpu = free.pop(0)
+            with open(os.path.join(log_dir, f"point_{i}.log"), "w") as log:
+                proc = subprocess.Popen(
+                    f"{command} {point}",
+                    shell=True,
+                    executable="/bin/bash",
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    env={**os.environ, "CUDA_VISIBLE_DEVICES": gpu},
+                )
+            running[proc.pid] = (proc, i, gpu, time.time())
+            print(f"Started point {i} on GPU {gpu}: {point}", flush=True)
+
+        pid, wait_status = os.wait()
+        if pid not in running:
+            continue
+        proc, i, gpu, start = running.pop(pid)
+        exit_code = os.waitstatus_to_exitcode(wait_status)
+        proc.returncode = exit_code
+        free.append(gpu)
+        n_failed += exit_code != 0
+        print(f"Point {i} finished with exit code {exit_code}", flush=True)
+        with open(status_path, "a") as file:
+            file.write(
+                json.dumps(
+                    dict(point=i, exit_code=exit_code, seconds=time.time() - start)
+                )
+                + "\n"
+            )
+    return n_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--points", type=str, required=True)
+    parser.add_argument("--n_gpu", type=int, required=True)
+    parser.add_argument("--log_dir", type=str, required=True)
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    with open(args.points, "r") as file:
+        points = [line.strip() for line in file if line.strip()]
+    n_failed = run_points(
+        points, " ".join(command), visible_gpus(args.n_gpu), args.log_dir
+    )
+    print(f"{len(points) - n_failed}/{len(points)} points succeeded.")
+    sys.exit(1 if n_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,426 @@
-from slurm_tools.do_slurm_job import slurm_job, obtain_parser
-import itertools
-from typing import Any
+from slurm_tools.do_slurm_job import slurm_job, obtain_parser, runs_dir
+from slurm_tools.submit import submit, submit_many
+from slurm_tools import sweep_manifest
+from slurm_tools.daemon import forwarded
+from slurm_tools.sweep_strategies import (
+    DEFAULT_METRIC_REGEX,
+    MULTI_FIDELITY_STRATEGIES,
+    STRATEGIES,
+    format_resource,
+    read_metric,
+    sample_points,
+)
+import os
+import time as time_module
+from collections import Counter
 from slurm_tools.util import load_yaml
 import json
 
 
-def format_param_choices(param_choices: dict[str, Any]):
+def format_param_choices(param_choices: dict[str, object]):
     return " ".join([f"--{key} {value}" for key, value in param_choices.items()])
 
 
-def param_sweep_grid(sweep_params: dict[str, list], program_call: str, **job_kwargs):
+def select_resume_points(
+    points: list[dict], run_group_dir: str, time: str, resume_time: str | None = None
+) -> list[tuple[dict, str]]:
     """
-    Run a parameter sweep over a grid of hyperparameters.
+    Return the points of a previous sweep that have to be submitted again, each with
+    its time limit. Completed and still active points are skipped. Timed out points get
+    resume_time if given.
+    """
+    manifest = sweep_manifest.load(run_group_dir)
+    sweep_manifest.refresh_states(run_group_dir, manifest)
+    selected, counts = [], Counter()
+    for point in points:
+        status = sweep_manifest.status(manifest.get(sweep_manifest.point_key(point)))
+        counts[status] += 1
+        if status in {"done", "active", "unknown"}:
+            continue
+        point_time = resume_time if status == "TIMEOUT" and resume_time else time
+        selected.append((point, point_time))
+    print(
+        "Sweep state: "
+        + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    )
+    if counts["unknown"]:
+        print(
+            f"Skipping {counts['unknown']} point(s) unknown to sacct. "
+            "They were either just submitted or purged from the accounting database."
+        )
+    print(f"Resubmitting {len(selected)}/{len(points)} grid points.")
+    return selected
+
+
+def submit_points(
+    points: list[tuple[dict, str]],
+    program_call: str,
+    run_group_dir: str,
+    submit_workers: int = 8,
+    **job_kwargs,
+) -> list[tuple[dict, str, int | None]]:
+    """
+    Render one job per (parameter choices, time limit) and submit them concurrently.
+    Returns (parameter choices, job dir, slurm job ID or None) of the rendered jobs.
+    """
+    params, submissions = [], []
+    for param_choices, time in points:
+        choice_program_call = f"{program_call} {format_param_choices(param_choices)}"
+
+        submission = slurm_job(
+            program_call=choice_program_call,
+            time=time,
+            defer_submit=True,
+            **job_kwargs,
+        )
+        if submission is not None:
+            params.append(param_choices)
+            submissions.append(submission)
+
+    if not submissions:
+        return []
+    job_ids = submit_many(
+        submissions,
+        max_workers=submit_workers,
+        retries=job_kwargs.get("submit_retries", 5),
+    )
+    submitted = [(p, s.job_dir, j) for p, s, j in zip(params, submissions, job_ids)]
+    sweep_manifest.record_submissions(run_group_dir, submitted)
+    return submitted
+
+
+def submit_packs(
+    points: list[tuple[dict, str]],
+    program_call: str,
+    run_group_dir: str,
+    pack: int,
+    submit_workers: int = 8,
+    **job_kwargs,
+) -> list[tuple[dict, str, int | None]]:
+    """
+    Like submit_points, but run up to pack points inside each job, one point per GPU
+    at a time. All points of a job share its job dir and slurm job ID.
+    """
+    params, submissions = [], []
+    for time in dict.fromkeys(t for _, t in points):
+        same_time = [p for p, t in points if t == time]
+        for i in range(0, len(same_time), pack):
+            chunk = same_time[i : i + pack]
+            submission = slurm_job(
+                program_call=program_call,
+                time=time,
+                pack_params=[format_param_choices(p) for p in chunk],
+                defer_submit=True,
+                **job_kwargs,
+            )
+            if submission is not None:
+                params.append(chunk)
+                submissions.append(submission)
+
+    if not submissions:
+        return []
+    print(f"Packed {len(points)} points into {len(submissions)} jobs.")
+    job_ids = submit_many(
+        submissions,
+        max_workers=submit_workers,
+        retries=job_kwargs.get("submit_retries", 5),
+    )
+    submitted = [
+        (p, s.job_dir, j)
+        for chunk, s, j in zip(params, submissions, job_ids)
+        for p in chunk
+    ]
+    sweep_manifest.record_submissions(run_group_dir, submitted)
+    return submitted
+
+
+def param_sweep_grid(
+    sweep_params: dict[str, list],
+    program_call: str,
+    submit_workers: int = 8,
+    strategy: str = "grid",
+    budget: int = 0,
+    seed: int = 0,
+    pack: int = 0,
+    resume: bool = False,
+    resume_time: str | None = None,
+    **job_kwargs,
+):
+    """
+    Run a parameter sweep over a grid of hyperparameters, or over the points chosen by
+    another strategy of sweep_strategies.
+    All scripts are rendered first and then submitted concurrently.
 
     Args:
         sweep_params (dict[str, list]): A dictionary mapping hyperparameter names to lists of values to sweep over.
+        submit_workers (int): Number of concurrent sbatch calls.
+        strategy (str): grid, random or lhs.
+        budget (int): Number of points for the random and lhs strategies.
+        seed (int): Seed of the random and lhs strategies.
+        pack (int): Run up to pack points per job, one per GPU at a time (0 for one job per point).
+        resume (bool): Only submit points of a previous sweep of the run group that are missing, failed or timed out.
+        resume_time (str): Time limit for resubmitted points that timed out.
+        **job_kwargs: Keyword arguments to pass to slurm_job.
+
+    Returns:
+        list[int | None]: The slurm job IDs of the submitted points.
+    """
+    run_group_dir = os.path.join(
+        runs_dir(job_kwargs["template_file"]), job_kwargs["run_group"]
+    )
+    time = job_kwargs.pop("time")
+    points = [(p, time) for p in sample_points(sweep_params, strategy, budget, seed)]
+    if resume:
+        points = select_resume_points(
+            [p for p, _ in points], run_group_dir, time, resume_time
+        )
+    if pack:
+        submitted = submit_packs(
+            points, program_call, run_group_dir, pack, submit_workers, **job_kwargs
+        )
+    else:
+        submitted = submit_points(
+            points, program_call, run_group_dir, submit_workers, **job_kwargs
+        )
+    return [job_id for _, _, job_id in submitted]
+
+
+def param_sweep_array(
+    sweep_params: dict[str, list],
+    program_call: str,
+    array_limit: int,
+    strategy: str = "grid",
+    budget: int = 0,
+    seed: int = 0,
+    resume: bool = False,
+    resume_time: str | None = None,
+    **job_kwargs,
+):
+    """
+    Run a parameter sweep over a grid of hyperparameters as a single slurm job array.
+    When resuming, timed out points with a new time limit are submitted as a second array.
+
+    Args:
+        sweep_params (dict[str, list]): A dictionary mapping hyperparameter names to lists of values to sweep over.
+        array_limit (int): Maximum number of array tasks running at once (0 for no limit).
+        strategy (str): grid, random or lhs.
+        budget (int): Number of points for the random and lhs strategies.
+        seed (int): Seed of the random and lhs strategies.
+        resume (bool): Only submit points of a previous sweep of the run group that are missing, failed or timed out.
+        resume_time (str): Time limit for resubmitted points that timed out.
         **job_kwargs: Keyword arguments to pass to slurm_job.
 
     Returns:
         None
     """
-    keys = list(sweep_params.keys())
-    values = list(sweep_params.values())
-    for param_values in itertools.product(*values):
-        param_choices = dict(zip(keys, param_values))
-        choice_program_call = f"{program_call} {format_param_choices(param_choices)}"
+    run_group_dir = os.path.join(
+        runs_dir(job_kwargs["template_file"]), job_kwargs["run_group"]
+    )
+    time = job_kwargs.pop("time")
+    points = [(p, time) for p in sample_points(sweep_params, strategy, budget, seed)]
+    if resume:
+        points = select_resume_points(
+            [p for p, _ in points], run_group_dir, time, resume_time
+        )
+
+    for array_time in dict.fromkeys(t for _, t in points):
+        params = [p for p, t in points if t == array_time]
+        print(f"Submitting {len(params)} grid points as one job array.")
+        submission = slurm_job(
+            program_call=program_call,
+            time=array_time,
+            array_params=[format_param_choices(p) for p in params],
+            array_limit=array_limit,
+            defer_submit=True,
+            **job_kwargs,
+        )
+        if submission is None:
+            continue
+        job_id = submit(submission, retries=job_kwargs.get("submit_retries", 5))
+        sweep_manifest.record_submissions(
+            run_group_dir,
+            [(p, submission.job_dir, f"{job_id}_{i}") for i, p in enumerate(params)],
+        )
+
+
+def wait_for_jobs(job_ids: list[str], poll_interval: float = 60):
+    """Block until sacct reports a terminal state for all jobs."""
+    from slurm_tools.cluster_snapshot import job_states
+
+    waiting = set(job_ids)
+    while waiting:
+        states = job_states(sorted(waiting))
+        waiting = {
+            j
+            for j in waiting
+            if states.get(j) is None or states[j] in sweep_manifest.ACTIVE_STATES
+        }
+        if waiting:
+            print(f"Waiting for {len(waiting)} job(s) to finish...")
+            time_module.sleep(poll_interval)
 
-        slurm_job(program_call=choice_program_call, **job_kwargs)
 
+def param_sweep_multi_fidelity(
+    sweep_params: dict,
+    program_call: str,
+    strategy: str,
+    resource_param: str,
+    max_resource: float,
+    min_resource: float = 1,
+    eta: int = 3,
+    budget: int = 0,
+    seed: int = 0,
+    metric_regex: str = DEFAULT_METRIC_REGEX,
+    maximize: bool = False,
+    poll_interval: float = 60,
+    submit_workers: int = 8,
+    **job_kwargs,
+):
+    """
+    Run a successive halving (sha) or Hyperband sweep. Rungs are submitted as grid jobs
+    with --<resource_param> set. This function blocks until the last rung has finished,
+    so run it in a persistent session (e.g. tmux).
+
+    Args:
+        sweep_params (dict): Parameter lists or ranges, see sweep_strategies.
+        resource_param (str): Parameter of the program that sets the resource (e.g. epochs).
+        max_resource (float): Resource of the last rung.
+        min_resource (float): Smallest resource of the first rung.
+        eta (int): Only the best 1/eta configs of a rung are promoted to the next rung.
+        budget (int): Number of configs of the sha strategy.
+        metric_regex (str): Regex whose first group is the metric in the slurm log.
+        maximize (bool): Promote the configs with the highest instead of lowest metric.
+        poll_interval (float): Seconds between sacct queries while waiting for a rung.
+        **job_kwargs: Keyword arguments to pass to slurm_job.
+
+    Returns:
+        tuple[float | None, dict] | None: The best metric and config.
+    """
+    brackets = MULTI_FIDELITY_STRATEGIES[strategy](
+        sweep_params, budget, min_resource, max_resource, eta, seed
+    )
+    run_group_dir = os.path.join(
+        runs_dir(job_kwargs["template_file"]), job_kwargs["run_group"]
+    )
+    time = job_kwargs.pop("time")
+    rung = 0
+    while not all(b.finished for b in brackets):
+        active = [b for b in brackets if not b.finished]
+        points = []
+        for b in active:
+            resource = format_resource(b.resource, min_resource, max_resource)
+            points.extend(
+                (dict(config, **{resource_param: resource}), time)
+                for config in b.configs
+            )
+        print(
+            f"Rung {rung}: submitting {len(points)} jobs of {len(active)} bracket(s)."
+        )
+        submitted = submit_points(
+            points, program_call, run_group_dir, submit_workers, **job_kwargs
+        )
+        if job_kwargs.get("dry"):
+            print("Dry run: only the first rung was rendered.")
+            return None
+        wait_for_jobs([str(j) for _, _, j in submitted if j is not None], poll_interval)
+        metrics = [
+            None if job_id is None else read_metric(job_dir, metric_regex)
+            for _, job_dir, job_id in submitted
+        ]
+        for b in active:
+            b.promote(metrics[: len(b.configs)], minimize=not maximize)
+            metrics = metrics[len(b.configs) :]
+        rung += 1
+
+    results = [r for b in brackets for r in b.results if r[0] is not None]
+    if not results:
+        print("❌ No job reported a metric.")
+        return None
+    best = (max if maximize else min)(results, key=lambda r: r[0])
+    print(f"✅ Best metric {best[0]}: {format_param_choices(best[1])}")
+    return best
 
+
+@forwarded
 def main():
     parser = obtain_parser()
     parser.add_argument("--sweep_config_path", type=str, default="")
     parser.add_argument("--sweep_params", type=str, default="")
+    parser.add_argument(
+        "--submit_workers",
+        type=int,
+        default=8,
+        help="Number of concurrent sbatch calls.",
+    )
+    parser.add_argument(
+        "--array",
+        action="store_true",
+        help="Submit the whole grid as a single slurm job array.",
+    )
+    parser.add_argument(
+        "--array_limit",
+        type=int,
+        default=0,
+        help="Maximum number of simultaneously running array tasks (0 for no limit).",
+    )
+    parser.add_argument(
+        "--pack",
+        type=int,
+        default=0,
+        help="Run up to this many points inside one job with --n_gpu GPUs, one point per GPU at a time. "
+        "--time is the time limit of the whole job.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Only resubmit grid points of the run group that are missing, failed or timed out.",
+    )
+    parser.add_argument(
+        "--resume_time",
+        type=str,
+        default=None,
+        help="Time limit for resubmitted grid points that timed out (default: --time).",
+    )
+    parser.add_argument(
+        "--strategy",
+        type=str,
+        default="grid",
+        choices=[*STRATEGIES, *MULTI_FIDELITY_STRATEGIES],
+        help="Search strategy, see slurm_tools/sweep_strategies.py.",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=0,
+        help="Number of points for random and lhs, number of configs for sha.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--resource_param",
+        type=str,
+        default="epochs",
+        help="Program parameter set to the resource of a rung (sha, hyperband).",
+    )
+    parser.add_argument("--min_resource", type=float, default=1)
+    parser.add_argument("--max_resource", type=float, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument(
+        "--metric_regex",
+        type=str,
+        default=DEFAULT_METRIC_REGEX,
+        help="Regex whose first group is the metric, matched against the slurm log.",
+    )
+    parser.add_argument(
+        "--maximize",
+        action="store_true",
+        help="Higher metrics are better (default: lower is better).",
+    )
+    parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=60,
+        help="Seconds between sacct queries while waiting for a rung to finish.",
+    )
     args = parser.parse_args()
 
     assert (
@@ -46,4 +434,34 @@ def main():
     delattr(args, "sweep_config_path")
     delattr(args, "sweep_params")
 
-    param_sweep_grid(sweep_config, **vars(args))
+    multi_fidelity_args = [
+        "resource_param",
+        "min_resource",
+        "max_resource",
+        "eta",
+        "metric_regex",
+        "maximize",
+        "poll_interval",
+    ]
+    if args.strategy in MULTI_FIDELITY_STRATEGIES:
+        assert not args.array, "--array is not supported by multi-fidelity strategies."
+        assert (
+            not args.resume
+        ), "--resume is not supported by multi-fidelity strategies."
+        for name in ["array", "array_limit", "pack", "resume", "resume_time"]:
+            delattr(args, name)
+        param_sweep_multi_fidelity(sweep_config, **vars(args))
+        return
+    for name in multi_fidelity_args:
+        delattr(args, name)
+
+    if args.array:
+        assert not args.pack, "--pack can not be combined with --array."
+        delattr(args, "array")
+        delattr(args, "submit_workers")
+        delattr(args, "pack")
+        param_sweep_array(sweep_config, **vars(args))
+    else:
+        delattr(args, "array")
+        delattr(args, "array_limit")
+        param_sweep_grid(sweep_config, **vars(args))
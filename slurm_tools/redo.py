@@ -1,5 +1,6 @@
 import os
 import argparse
+from slurm_tools.daemon import forwarded
 
 redos_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "redos")
 
@@ -28,6 +29,7 @@ def redo(oldness, execute=False):
         )
 
 
+@forwarded
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--oldness", type=int, default=0, help="0 for newest run")
@@ -24,7 +24,39 @@ def format_row(cols, widths):
     return " ".join(col.ljust(widths[i]) for i, col in enumerate(cols))
 
 
+def print_snapshot():
+    """Print the cached cluster snapshot in the default squeue layout."""
+    from slurm_tools.cluster_snapshot import get_snapshot
+    from slurm_tools.slurm_time_until_start import fmt_duration
+
+    header = ["JOBID", "PARTITION", "NAME", "USER", "GROUP", "ST", "TIME", "NODES"]
+    rows = [header + ["NODELIST(REASON)"]]
+    for job in get_snapshot().jobs:
+        rows.append(
+            [
+                job.jobid,
+                job.partition,
+                job.name,
+                job.user,
+                get_group_for_user(job.user),
+                job.state,
+                fmt_duration(job.elapsed_s),
+                str(job.n_nodes),
+                job.nodelist if job.state != "PD" else f"({job.reason})",
+            ]
+        )
+
+    widths = [max(len(r[i]) for r in rows) for i in range(len(header) + 1)]
+    for r in rows:
+        print(format_row(r, widths))
+
+
 def main():
+    if len(sys.argv) == 1:
+        # Without squeue arguments, the shared cached snapshot is enough
+        print_snapshot()
+        return
+
     squeue_cmd = ["squeue"] + sys.argv[1:]
 
     try:
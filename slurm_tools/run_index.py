@@ -0,0 +1,164 @@
+"""
+Append-only index of submitted jobs, stored as JSONL next to the run directories.
+
+Each line holds job_id, run_group, slurm_job_id, job_dir and submit_time. New jobs are
+appended, so reading the index from the end yields the newest jobs first without
+walking the run directory tree. Use the `reindex` command to rebuild it from disk.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from slurm_tools.daemon import forwarded
+from slurm_tools.script_store import MANIFEST_NAME
+from slurm_tools.util import iter_lines_reversed
+
+INDEX_NAME = ".run_index.jsonl"
+SLURM_LOG_RE = re.compile(r"^slurm-.*-(\d+)(?:_\d+)?\.out$")
+
+_lock = threading.Lock()
+
+
+def index_path(dest_dir: str) -> str:
+    return os.path.join(dest_dir, INDEX_NAME)
+
+
+def add_job_dir(job_dir: str, slurm_job_id: int | None = None):
+    """Append the job living in <dest_dir>/<run_group>/<job_id> to the index."""
+    job_dir = os.path.abspath(job_dir)
+    run_group_dir = os.path.dirname(job_dir)
+    entry = dict(
+        job_id=os.path.basename(job_dir),
+        run_group=os.path.basename(run_group_dir),
+        slurm_job_id=slurm_job_id,
+        job_dir=job_dir,
+        submit_time=time.time(),
+    )
+    line = json.dumps(entry) + "\n"
+    with _lock, open(index_path(os.path.dirname(run_group_dir)), "a") as file:
+        file.write(line)
+
+
+# dest_dir -> (inode, bytes read, entries oldest first) of indexes kept in memory
+_memo: dict[str, tuple[int, int, list[dict]]] = {}
+
+
+def warm(dest_dir: str) -> int:
+    """
+    Keep the index of dest_dir in memory, so that iter_entries in this process (and in
+    processes forked from it) only reads lines that were appended since. Repeated calls
+    only read the appended lines. Returns the number of entries.
+    """
+    path = index_path(dest_dir)
+    ino, offset, entries = _memo.get(dest_dir, (None, 0, []))
+    try:
+        with open(path, "rb") as file:
+            st = os.fstat(file.fileno())
+            if st.st_ino != ino or st.st_size < offset:
+                # Rebuilt by reindex
+                ino, offset, entries = st.st_ino, 0, []
+            file.seek(offset)
+            data = file.read()
+    except FileNotFoundError:
+        _memo.pop(dest_dir, None)
+        return 0
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    _memo[dest_dir] = (ino, offset + end, entries)
+    return len(entries)
+
+
+def iter_entries(dest_dir: str):
+    """Yield index entries newest first. Each job_dir is only yielded once."""
+    if dest_dir in _memo and warm(dest_dir):
+        lines = reversed(_memo[dest_dir][2])
+    else:
+        lines = iter_lines_reversed(index_path(dest_dir))
+    seen = set()
+    for line in lines:
+        try:
+            entry = line if isinstance(line, dict) else json.loads(line)
+        except json.JSONDecodeError:
+            continue  # partially written line
+        if entry["job_dir"] in seen:
+            continue
+        seen.add(entry["job_dir"])
+        yield entry
+
+
+def scan_job_dir(job_dir: str) -> dict | None:
+    """Build an index entry from the files in a job directory."""
+    script_path = os.path.join(job_dir, "slurm_script.sh")
+    if not os.path.lexists(script_path):
+        # Jobs submitted with --dedup_scripts only have a manifest
+        script_path = os.path.join(job_dir, MANIFEST_NAME)
+        if not os.path.exists(script_path):
+            return None
+    slurm_job_id = None
+    id_path = os.path.join(job_dir, "slurm_job_id")
+    if os.path.exists(id_path):
+        with open(id_path, "r") as file:
+            ids = file.read().split()
+        if ids:
+            slurm_job_id = int(ids[-1])
+    else:
+        for name in os.listdir(job_dir):
+            m = SLURM_LOG_RE.match(name)
+            if m:
+                slurm_job_id = int(m.group(1))
+    return dict(
+        job_id=os.path.basename(job_dir),
+        run_group=os.path.basename(os.path.dirname(job_dir)),
+        slurm_job_id=slurm_job_id,
+        job_dir=os.path.abspath(job_dir),
+        submit_time=os.lstat(script_path).st_mtime,
+    )
+
+
+def reindex(dest_dir: str) -> int:
+    """Rebuild the index of dest_dir from the <run_group>/<job_id> directories on disk."""
+    entries = []
+    for run_group in os.listdir(dest_dir):
+        run_group_dir = os.path.join(dest_dir, run_group)
+        if not os.path.isdir(run_group_dir):
+            continue
+        for job_id in os.listdir(run_group_dir):
+            job_dir = os.path.join(run_group_dir, job_id)
+            if os.path.isdir(job_dir):
+                entry = scan_job_dir(job_dir)
+                if entry is not None:
+                    entries.append(entry)
+    entries.sort(key=lambda x: x["submit_time"])
+
+    tmp_path = index_path(dest_dir) + ".tmp"
+    with open(tmp_path, "w") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+    with _lock:
+        os.replace(tmp_path, index_path(dest_dir))
+    return len(entries)
+
+
+@forwarded
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the run index from disk.")
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=os.path.join(os.environ["HOME"], "runs"),
+        help="Directory containing the run groups.",
+    )
+    args = parser.parse_args()
+    n_entries = reindex(args.path)
+    print(f"Indexed {n_entries} jobs in {index_path(args.path)}")
+
+
+if __name__ == "__main__":
+    main()
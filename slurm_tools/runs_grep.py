@@ -0,0 +1,250 @@
+"""
+Search the logs of all runs for a regex, like `grep -r ~/runs` but faster.
+
+Job directories are taken from the run index, so they can be filtered by run group and
+submit date without walking the run directory. Logs are memory-mapped and searched in
+parallel by a pool of processes. With --incremental, the offset up to which every file
+was searched is kept per pattern in ~/.cache/slurm_tools, so repeated
+searches only scan bytes that were appended since.
+
+Examples
+--------
+# Which run printed a NaN loss?
+runs_grep "loss[=:] *nan" -i
+
+# NCCL errors in the server logs of one run group since January
+runs_grep "NCCL (WARN|ERROR)" --kind server --run_group sglang --since 2025-01-01
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+
+from slurm_tools import run_index
+from slurm_tools.daemon import forwarded
+from slurm_tools.monitor_newest_slurm_run import file_predicate
+from slurm_tools.util import cache_dir, write_json_atomic
+
+KINDS = {
+    "slurm": file_predicate(),
+    "server": file_predicate(server_log=""),
+    "gpu": file_predicate(gpu_log=""),
+    "command": file_predicate(command_log=""),
+    "point": lambda n: n.startswith("point_") and n.endswith(".log"),
+}
+MAX_LINE_CHARS = 300
+
+
+def iter_job_dirs(dest_dir: str, run_group=None, since=None, until=None):
+    """Yield job directories from the run index (or the disk) filtered by group and date."""
+    if os.path.exists(run_index.index_path(dest_dir)):
+        entries = run_index.iter_entries(dest_dir)
+    else:
+        entries = (
+            run_index.scan_job_dir(os.path.join(dest_dir, group, job_id))
+            for group in os.listdir(dest_dir)
+            if os.path.isdir(os.path.join(dest_dir, group))
+            for job_id in os.listdir(os.path.join(dest_dir, group))
+            if os.path.isdir(os.path.join(dest_dir, group, job_id))
+        )
+    for entry in entries:
+        if entry is None or (run_group and entry["run_group"] != run_group):
+            continue
+        if since is not None and entry["submit_time"] < since:
+            continue
+        if until is not None and entry["submit_time"] >= until:
+            continue
+        yield entry["job_dir"]
+
+
+def search_file(path: str, pattern: bytes, flags: int, start: int, max_count: int):
+    """
+    Search path from byte offset start. Returns (path, matching lines, offset), where
+    offset is the end of the last complete line, so a partial last line is searched
+    again next time.
+    """
+    try:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size <= start:
+                return path, [], min(start, size)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = data.rfind(b"\n", start, size) + 1 or start
+                matches = []
+                line_end = -1
+                for m in re.compile(pattern, flags).finditer(data, start, end):
+                    if m.start() < line_end:
+                        continue  # one result per line
+                    line_start = data.rfind(b"\n", start, m.start()) + 1 or start
+                    line_end = data.find(b"\n", m.end(), end)
+                    line_end = end if line_end == -1 else line_end
+                    line = data[line_start:line_end][: MAX_LINE_CHARS * 4]
+                    matches.append(line.decode("utf-8", errors="replace").rstrip())
+                    if max_count and len(matches) >= max_count:
+                        break
+                return path, matches, end
+    except (OSError, ValueError):
+        return path, [], start
+
+
+def _checkpoint_path(pattern: str, flags: int) -> str:
+    import hashlib
+
+    key = hashlib.sha1(f"{flags}:{pattern}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir(), f"runs_grep_{key}.json")
+
+
+def _load_checkpoint(path: str) -> dict:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def runs_grep(
+    pattern: str,
+    dest_dir: str,
+    kinds: list[str],
+    run_group: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    ignore_case: bool = False,
+    workers: int | None = None,
+    incremental: bool = False,
+    max_count: int = 0,
+):
+    """Yield (path, matching lines) for every file with matches."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    flags = re.IGNORECASE if ignore_case else 0
+    predicates = [KINDS[k] for k in kinds]
+    files = []
+    for job_dir in iter_job_dirs(dest_dir, run_group, since, until):
+        try:
+            names = os.listdir(job_dir)
+        except FileNotFoundError:
+            continue
+        files.extend(
+            os.path.join(job_dir, n) for n in names if any(p(n) for p in predicates)
+        )
+
+    checkpoint_path = _checkpoint_path(pattern, flags)
+    checkpoint = _load_checkpoint(checkpoint_path) if incremental else {}
+    starts = []
+    for path in files:
+        inode, offset = checkpoint.get(path, (None, 0))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            starts.append(0)
+            continue
+        # Rotated or truncated files are searched from the start
+        starts.append(offset if inode == st.st_ino and offset <= st.st_size else 0)
+
+    n = len(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            search_file,
+            files,
+            [pattern.encode()] * n,
+            [flags] * n,
+            starts,
+            [max_count] * n,
+            chunksize=16,
+        )
+        try:
+            for path, matches, offset in results:
+                if incremental:
+                    try:
+                        checkpoint[path] = (os.stat(path).st_ino, offset)
+                    except FileNotFoundError:
+                        checkpoint.pop(path, None)
+                if matches:
+                    yield path, matches
+        finally:
+            if incremental:
+                write_json_atomic(checkpoint_path, checkpoint)
+
+
+def _timestamp(date: str | None) -> float | None:
+    from datetime import datetime
+
+    return None if date is None else datetime.fromisoformat(date).timestamp()
+
+
+@forwarded
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("pattern", type=str, help="Python regular expression.")
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=os.path.join(os.environ["HOME"], "runs"),
+        help="Directory containing the run groups.",
+    )
+    parser.add_argument("--run_group", type=str, default=None)
+    parser.add_argument(
+        "--since", type=str, default=None, help="Only jobs submitted from this date on."
+    )
+    parser.add_argument(
+        "--until", type=str, default=None, help="Only jobs submitted before this date."
+    )
+    parser.add_argument(
+        "--kind",
+        type=str,
+        nargs="+",
+        default=["slurm"],
+        choices=[*KINDS, "all"],
+        help="Kinds of log files to search.",
+    )
+    parser.add_argument("-i", "--ignore_case", action="store_true")
+    parser.add_argument(
+        "-m", "--max_count", type=int, default=0, help="Stop after N matches per file."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of search processes."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only search bytes appended since the last search for this pattern.",
+    )
+    parser.add_argument(
+        "-l",
+        "--files_with_matches",
+        action="store_true",
+        help="Only print the names of files with matches.",
+    )
+    args = parser.parse_args()
+
+    kinds = list(KINDS) if "all" in args.kind else args.kind
+    n_files = n_matches = 0
+    for path, matches in runs_grep(
+        args.pattern,
+        args.path,
+        kinds,
+        run_group=args.run_group,
+        since=_timestamp(args.since),
+        until=_timestamp(args.until),
+        ignore_case=args.ignore_case,
+        workers=args.workers,
+        incremental=args.incremental,
+        max_count=args.max_count,
+    ):
+        n_files += 1
+        n_matches += len(matches)
+        name = os.path.relpath(path, args.path)
+        if args.files_with_matches:
+            print(name)
+            continue
+        for line in matches:
+            print(f"{name}: {line[:MAX_LINE_CHARS]}")
+    print(f"{n_matches} match(es) in {n_files} file(s).")
+
+
+if __name__ == "__main__":
+    main()
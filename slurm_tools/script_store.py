@@ -0,0 +1,194 @@
+"""
+Content-addressed store for rendered slurm scripts.
+
+With `slurm_job --dedup_scripts`, the script of a job is not written into its job
+directory. Instead, the rendered template with the per-job values (job_dir, job_id and
+program_call) left as placeholders is stored once under
+<dest_dir>/.scripts/<hash[:2]>/<hash>.sh, and the job directory only holds a
+manifest.json with the script hash and the per-job values. The script is submitted via
+stdin. Jobs of a sweep share a single stored script, so a sweep no longer costs one
+script file per job.
+
+Every stored script has a <hash>.refs file listing the job directories that used it.
+
+Examples
+--------
+# Which jobs used the same script as this job?
+script_users ~/runs/sweep/2025_01_01__12_00_00
+
+# Print the full script of a deduplicated job
+script_users --show ~/runs/sweep/2025_01_01__12_00_00
+
+# Stored scripts and their number of jobs
+script_users --list
+"""
+import argparse
+import os
+import threading
+
+from slurm_tools.daemon import forwarded
+from slurm_tools.util import write_json_atomic
+
+STORE_NAME = ".scripts"
+MANIFEST_NAME = "manifest.json"
+# Values that differ between the jobs of a sweep and are filled in at submit time
+VARYING_KEYS = ("job_dir", "job_id", "program_call")
+
+_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("{", "{{").replace("}", "}}")
+
+
+def skeleton(template, values: dict) -> str:
+    """Render template with all values except VARYING_KEYS, which stay placeholders."""
+    return template.source.format_map(
+        {
+            k: "{" + k + "}" if k in VARYING_KEYS else _escape(v)
+            for k, v in values.items()
+        }
+    )
+
+
+def store_path(dest_dir: str, script_hash: str, ext: str = ".sh") -> str:
+    return os.path.join(dest_dir, STORE_NAME, script_hash[:2], script_hash + ext)
+
+
+def store_script(dest_dir: str, text: str) -> str:
+    """Store text unless it already is in the store and return its hash."""
+    import hashlib
+
+    script_hash = hashlib.sha256(text.encode()).hexdigest()
+    path = store_path(dest_dir, script_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+    return script_hash
+
+
+def write_job_manifest(job_dir: str, template, values: dict) -> str:
+    """Store the shared script of a job and write its manifest. Returns the script hash."""
+    dest_dir = os.path.dirname(os.path.dirname(os.path.abspath(job_dir)))
+    script_hash = store_script(dest_dir, skeleton(template, values))
+    write_json_atomic(
+        os.path.join(job_dir, MANIFEST_NAME),
+        {"script": script_hash, "values": {k: values[k] for k in VARYING_KEYS}},
+    )
+    with _lock, open(store_path(dest_dir, script_hash, ".refs"), "a") as file:
+        file.write(os.path.abspath(job_dir) + "\n")
+    return script_hash
+
+
+def read_manifest(job_dir: str) -> dict | None:
+    import json
+
+    try:
+        with open(os.path.join(job_dir, MANIFEST_NAME), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def job_script(job_dir: str) -> str:
+    """The full slurm script of a job, deduplicated or not."""
+    manifest = read_manifest(job_dir)
+    if manifest is None:
+        with open(os.path.join(job_dir, "slurm_script.sh"), "r") as file:
+            return file.read()
+    dest_dir = os.path.dirname(os.path.dirname(os.path.abspath(job_dir)))
+    with open(store_path(dest_dir, manifest["script"]), "r") as file:
+        return file.read().format_map(manifest["values"])
+
+
+def resolve_hash(dest_dir: str, target: str) -> str:
+    """Script hash of a job directory, a stored script or a (prefix of a) hash."""
+    if os.path.isdir(target):
+        manifest = read_manifest(target)
+        if manifest is None:
+            raise ValueError(f"{target} was not submitted with --dedup_scripts.")
+        return manifest["script"]
+    name = os.path.basename(target).removesuffix(".sh").removesuffix(".refs")
+    shard = os.path.join(dest_dir, STORE_NAME, name[:2])
+    matches = (
+        {f.split(".")[0] for f in os.listdir(shard) if f.startswith(name)}
+        if len(name) >= 2 and os.path.isdir(shard)
+        else set()
+    )
+    if len(matches) != 1:
+        raise ValueError(
+            f"{target} matches {len(matches)} stored scripts, expected exactly one."
+        )
+    return matches.pop()
+
+
+def script_users(dest_dir: str, script_hash: str) -> list[str]:
+    """Job directories that were submitted with the given script."""
+    try:
+        with open(store_path(dest_dir, script_hash, ".refs"), "r") as file:
+            return list(dict.fromkeys(line.strip() for line in file if line.strip()))
+    except FileNotFoundError:
+        return []
+
+
+def iter_scripts(dest_dir: str):
+    """Yield (hash, number of jobs) for all stored scripts."""
+    root = os.path.join(dest_dir, STORE_NAME)
+    if not os.path.isdir(root):
+        return
+    for shard in sorted(os.listdir(root)):
+        for name in sorted(os.listdir(os.path.join(root, shard))):
+            if name.endswith(".sh"):
+                script_hash = name.removesuffix(".sh")
+                yield script_hash, len(script_users(dest_dir, script_hash))
+
+
+@forwarded
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "target",
+        nargs="?",
+        help="Job directory, stored script or (prefix of a) script hash.",
+    )
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=os.path.join(os.environ["HOME"], "runs"),
+        help="Directory containing the run groups.",
+    )
+    parser.add_argument(
+        "--show", action="store_true", help="Print the full script of the job."
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List stored scripts and their users."
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for script_hash, n_users in iter_scripts(args.path):
+            print(f"{script_hash[:12]}  {n_users} job(s)")
+        return
+    if args.target is None:
+        parser.error("A target is required unless --list is given.")
+    if args.show:
+        print(job_script(args.target), end="")
+        return
+    try:
+        script_hash = resolve_hash(args.path, args.target)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    users = script_users(args.path, script_hash)
+    print(f"Script {script_hash[:12]} was used by {len(users)} job(s):")
+    for job_dir in users:
+        print(f"  {job_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,10 @@
 """
 Estimate when SLURM resources (nodes or GPUs) will be free based on current jobs' TIME and TIME_LIMIT.
 
-Two modes (mutually exclusive):
+Three modes (mutually exclusive):
   --n-nodes N    -> earliest time when N whole nodes are completely idle
   --n-gpu   G    -> earliest time when G GPUs are free on **one single node** (not aggregated across nodes)
+  --table        -> the wait for every GPUs-per-node x node count shape, as a matrix
 
 The script shells out to squeue/sinfo and uses only TIME (%M) and TIME_LIMIT (%l) from squeue.
 If the requested resources are already available, it prints that and exits with code 0.
@@ -16,6 +17,9 @@ python slurm_free_time.py --n-nodes 3 --partition gpu
 
 # Earliest time 8 GPUs are free on a single node (typical max per node)
 python slurm_free_time.py --n-gpu 8
+
+# Wait for every GPU count (columns) and node count (rows) at once
+python slurm_free_time.py --table --max-nodes 4
 """
 from __future__ import annotations
 import argparse
@@ -28,13 +32,30 @@ from typing import Dict, List, Tuple, Iterable
 # ---------- Helpers ----------
 
 
+class EstimatorError(Exception):
+    """Base class for errors of the start time estimator."""
+
+
+class SlurmCommandError(EstimatorError):
+    """A SLURM command failed or is not installed."""
+
+
+class NoNodesError(EstimatorError):
+    """No usable nodes were found (check the partition)."""
+
+
+class InsufficientResourcesError(EstimatorError):
+    """The request can never be satisfied by the nodes of the cluster."""
+
+
 def run(cmd: List[str]) -> str:
     try:
         out = subprocess.check_output(cmd, text=True)
         return out
     except subprocess.CalledProcessError as e:
-        print(f"ERROR running {' '.join(cmd)}\n{e}\n{e.output}", file=sys.stderr)
-        sys.exit(2)
+        raise SlurmCommandError(f"ERROR running {' '.join(cmd)}\n{e}\n{e.output}")
+    except FileNotFoundError:
+        raise SlurmCommandError(f"{cmd[0]} not found. Is SLURM installed?")
 
 
 _TIME_RE = re.compile(
@@ -101,10 +122,28 @@ RANGE_RE = re.compile(r"^(?P<prefix>.*)\[(?P<body>[^\]]+)\]$")
 SUBRANGE_RE = re.compile(r"^(?P<start>\d+)(?:-(?P<end>\d+))?$")
 
 
+def split_nodelist(n: str) -> List[str]:
+    """Split 'a[1-2,4],b3' at the commas outside of brackets -> ['a[1-2,4]', 'b3']."""
+    out, depth, start = [], 0, 0
+    for i, c in enumerate(n):
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            out.append(n[start:i])
+            start = i + 1
+    out.append(n[start:])
+    return [x for x in out if x]
+
+
 def expand_nodelist(n: str) -> List[str]:
     n = (n or "").strip()
     if not n or n.startswith("("):  # e.g., (Resources) for PD
         return []
+    groups = split_nodelist(n)
+    if len(groups) > 1:
+        return [node for group in groups for node in expand_nodelist(group)]
     m = RANGE_RE.match(n)
     if not m:
         return [n]
@@ -156,24 +195,20 @@ def parse_tres_gpu_count(tres: str) -> int:
 
 
 def read_jobs(consider_cg: bool) -> List[Job]:
-    fmt = "%i|%t|%M|%l|%N|%b"
-    out = run(["squeue", "-h", "-o", fmt])
+    from slurm_tools.cluster_snapshot import get_snapshot
+
     jobs: List[Job] = []
-    for line in out.strip().splitlines():
-        jobid, state, elapsed, limit, nodelist, tres = (
-            x.strip() for x in line.split("|")
-        )
-        if state not in {"R", "CG" if consider_cg else "R"}:
+    for record in get_snapshot().jobs:
+        if record.state not in {"R", "CG" if consider_cg else "R"}:
             continue
-        nodes = expand_nodelist(nodelist)
         jobs.append(
             Job(
-                jobid=jobid,
-                state=state,
-                elapsed_s=parse_slurm_time(elapsed),
-                limit_s=parse_slurm_time(limit),
-                nodes=nodes,
-                gpus_per_node=parse_tres_gpu_count(tres),
+                jobid=record.jobid,
+                state=record.state,
+                elapsed_s=record.elapsed_s,
+                limit_s=record.limit_s,
+                nodes=record.nodes,
+                gpus_per_node=record.gpus_per_node,
             )
         )
     return jobs
@@ -212,65 +247,76 @@ def read_nodes(
 ) -> Tuple[Dict[str, int], Dict[str, str], Dict[str, str]]:
     """Return (node_total_gpus, node_partition, node_state) for nodes in sinfo (per-node view).
     If partition is set, only include nodes in that partition.
-    Falls back to `scontrol show node` if %G does not expose GPUs.
+    Falls back to a cached `scontrol show node` table if sinfo does not expose GPUs.
     """
-    cmd = ["sinfo", "-h", "-N", "-o", "%N|%G|%P|%t"]
-    out = run(cmd)
+    from slurm_tools.cluster_snapshot import get_snapshot
+
     totals: Dict[str, int] = {}
     parts: Dict[str, str] = {}
     states: Dict[str, str] = {}
     exclude_set = set(exclude)
 
-    lines = [ln for ln in out.strip().splitlines() if ln.strip()]
-    for line in lines:
-        name, gres, part, state = (x.strip() for x in line.split("|"))
+    for node in get_snapshot().nodes:
+        name, state = node.name, node.state
         if state not in {"mix", "mix-", "alloc", "alloc-", "idle", "idle-"}:
             continue
         if name in exclude_set:
             continue
-        # Keep only nodes in requested partition if provided. sinfo may list multiple partitions as partA* or partA,partB
-        if partition:
-            part_names = [p.rstrip("*") for p in part.split(",")]
-            if partition not in part_names:
-                continue
-        total_gpu = _parse_gpu_total_from_gres(gres)
-        if total_gpu == 0:
-            # Fallback: query scontrol for this node
-            try:
-                sc = run(["scontrol", "show", "node", name])
-                # Try Gres=... first
-                m = re.search(r"Gres=([^\s]+)", sc)
-                if m:
-                    total_gpu = _parse_gpu_total_from_gres(m.group(1))
-                if total_gpu == 0:
-                    # Some clusters expose CfgTRES=... which may contain gres/gpu:8
-                    m2 = re.search(r"CfgTRES=([^\s]+)", sc)
-                    if m2:
-                        cfg = m2.group(1)
-                        # translate gres/gpu:... to gpu:... for parser
-                        cfg = cfg.replace("gres/", "")
-                        total_gpu = _parse_gpu_total_from_gres(cfg)
-            except Exception:
-                pass
-        totals[name] = total_gpu
+        # Keep only nodes in requested partition if provided
+        if partition and partition not in node.partitions:
+            continue
+        part = ",".join(node.partitions)
+        totals[name] = node.total_gpus
         parts[name] = part
         # Normalize state (remove trailing '-' which indicates powering up/down)
         states[name] = state.rstrip("-")
+
+    missing = [name for name, total_gpu in totals.items() if total_gpu == 0]
+    if missing:
+        # Fallback: one cached `scontrol show node` call for all nodes
+        from slurm_tools.cluster_snapshot import node_gpu_table
+
+        gpu_table = node_gpu_table()
+        if any(name not in gpu_table for name in missing):
+            gpu_table = node_gpu_table(refresh=True)
+        for name in missing:
+            totals[name] = gpu_table.get(name, 0)
     return totals, parts, states
 
 
+def parse_scontrol_nodes(out: str) -> Dict[str, int]:
+    """Parse `scontrol show node --oneliner` output into node -> total GPUs.
+    Uses Gres=... and falls back to CfgTRES=... (e.g. gres/gpu=8).
+    """
+    totals: Dict[str, int] = {}
+    for line in out.splitlines():
+        m = re.search(r"NodeName=(\S+)", line)
+        if not m:
+            continue
+        total_gpu = 0
+        m_gres = re.search(r"Gres=(\S+)", line)
+        if m_gres:
+            total_gpu = _parse_gpu_total_from_gres(m_gres.group(1))
+        if total_gpu == 0:
+            m_tres = re.search(r"CfgTRES=(\S+)", line)
+            if m_tres:
+                # e.g. gres/gpu=8 or only typed entries like gres/gpu:h200=8
+                found = re.findall(r"gres/gpu(:[^=,]+)?=(\d+)", m_tres.group(1))
+                untyped = [int(n) for t, n in found if not t]
+                total_gpu = untyped[0] if untyped else sum(int(n) for _, n in found)
+        totals[m.group(1)] = total_gpu
+    return totals
+
+
 # ---------- Core logic ----------
 
 
-def earliest_time_for_nodes(
-    n_needed: int,
+def node_free_times(
     jobs: List[Job],
     node_totals: Dict[str, int],
     node_states: Dict[str, str],
-) -> Tuple[int, List[Tuple[str, int]]]:
-    """Return (seconds, details), where details lists (node, free_in_seconds).
-    A node is free when all jobs on it have finished.
-    """
+) -> Dict[str, int]:
+    """Return node -> seconds until all jobs on it have finished (0 if free now)."""
     # Map node -> list of remaining times for jobs on that node
     by_node: Dict[str, List[int]] = {n: [] for n in node_totals}
     for j in jobs:
@@ -282,31 +328,43 @@ def earliest_time_for_nodes(
     # - 'alloc' means node is fully allocated (even if we don't see jobs)
     # - 'idle' means node is completely free
     # - 'mix' means partial allocation
-    free_now = []
-    occupied = []
+    times: Dict[str, int] = {}
     for n, lst in by_node.items():
         state = node_states.get(n, "alloc")
         if state == "idle":
             # Node is idle according to SLURM - it's free now
-            free_now.append(n)
+            times[n] = 0
         elif state == "alloc" and len(lst) == 0:
             # Node is allocated but we don't see jobs - assume it's occupied with unknown end time
             # Use a large but not infinite time (24 hours) as a fallback
-            occupied.append((n, 86400))
+            times[n] = 86400
         elif len(lst) == 0:
             # mix state with no visible jobs - treat as free
-            free_now.append(n)
+            times[n] = 0
         else:
             # We have job info - use it
-            occupied.append((n, max(lst)))
+            times[n] = max(lst)
+    return times
+
+
+def earliest_time_for_nodes(
+    n_needed: int,
+    jobs: List[Job],
+    node_totals: Dict[str, int],
+    node_states: Dict[str, str],
+) -> Tuple[int, List[Tuple[str, int]]]:
+    """Return (seconds, details), where details lists (node, free_in_seconds).
+    A node is free when all jobs on it have finished.
+    """
+    times = node_free_times(jobs, node_totals, node_states)
+    free_now = [n for n, t in times.items() if t == 0]
+    occupied = [(n, t) for n, t in times.items() if t > 0]
 
     if len(free_now) >= n_needed:
         return 0, [(n, 0) for n in free_now[:n_needed]]
 
     occupied.sort(key=lambda x: x[1])
     k = n_needed - len(free_now)
-    if k <= 0:
-        return 0, [(n, 0) for n in free_now[:n_needed]]
     if k > len(occupied):
         # Not enough nodes exist
         return 10**12, []
@@ -315,16 +373,12 @@ def earliest_time_for_nodes(
     return deadline, details
 
 
-def earliest_time_for_gpus(
-    g_needed: int,
+def gpu_usage(
     jobs: List[Job],
     node_totals: Dict[str, int],
     node_states: Dict[str, str],
-) -> Tuple[int, Dict[str, List[Tuple[int, int]]]]:
-    """Return (seconds, details) for the earliest time when *a single node* has at least g_needed GPUs free.
-    details per node is list of (t_free, gpus_free_increment) for transparency.
-    """
-    # Current usage per node and per-node release events
+) -> Tuple[Dict[str, int], Dict[str, List[Tuple[int, int]]]]:
+    """Return (used GPUs per node, per-node release events (t_free, gpus))."""
     used: Dict[str, int] = {n: 0 for n in node_totals}
     events_by_node: Dict[str, List[Tuple[int, int]]] = {n: [] for n in node_totals}
 
@@ -349,6 +403,20 @@ def earliest_time_for_gpus(
         elif state == "idle":
             # Node is idle - no GPUs are used
             used[n] = 0
+    return used, events_by_node
+
+
+def earliest_time_for_gpus(
+    g_needed: int,
+    jobs: List[Job],
+    node_totals: Dict[str, int],
+    node_states: Dict[str, str],
+) -> Tuple[int, Dict[str, List[Tuple[int, int]]]]:
+    """Return (seconds, details) for the earliest time when *a single node* has at least g_needed GPUs free.
+    details per node is list of (t_free, gpus_free_increment) for transparency.
+    """
+    # Current usage per node and per-node release events
+    used, events_by_node = gpu_usage(jobs, node_totals, node_states)
 
     # Check immediate availability per node
     for n, total in node_totals.items():
@@ -375,68 +443,267 @@ def earliest_time_for_gpus(
     return best_time, events_by_node
 
 
-def find_n_gpu(n_gpu: int):
-    node_totals, _, node_states = read_nodes(None, [])
-    if not node_totals:
-        print("No nodes found (check --partition).")
-        sys.exit(3)
+def availability_table(
+    jobs: List[Job],
+    node_totals: Dict[str, int],
+    node_states: Dict[str, str],
+    max_nodes: int,
+) -> Tuple[List[List[int]], List[int]]:
+    """Compute the wait for every job shape in one pass.
+    Returns (gpu_table, node_column), where gpu_table[k - 1][g - 1] is the seconds until k
+    nodes have at least g free GPUs each and node_column[k - 1] the seconds until k
+    nodes are completely free.
+    """
+    inf = 10**12
+    max_gpus = max(node_totals.values(), default=0)
+    used, events_by_node = gpu_usage(jobs, node_totals, node_states)
 
+    # Per GPU count, the time each node reaches that many free GPUs
+    times_by_gpus: List[List[int]] = [[] for _ in range(max_gpus)]
+    for n, total in node_totals.items():
+        free = max(total - used.get(n, 0), 0)
+        reached = [0] * min(free, total) + [inf] * (total - min(free, total))
+        for t, g in sorted(events_by_node[n]):
+            for gg in range(free, min(free + g, total)):
+                reached[gg] = t
+            free += g
+        for gg in range(total):
+            times_by_gpus[gg].append(reached[gg])
+
+    gpu_table = [[inf] * max_gpus for _ in range(max_nodes)]
+    for gg, times in enumerate(times_by_gpus):
+        times.sort()
+        for k in range(min(max_nodes, len(times))):
+            gpu_table[k][gg] = times[k]
+
+    node_times = sorted(node_free_times(jobs, node_totals, node_states).values())
+    node_column = [
+        node_times[k] if k < len(node_times) else inf for k in range(max_nodes)
+    ]
+    return gpu_table, node_column
+
+
+def fmt_compact(seconds: int) -> str:
+    if seconds >= 10**12:
+        return "never"
+    if seconds <= 0:
+        return "now"
+    mins = seconds // 60
+    hrs, m = divmod(mins, 60)
+    days, h = divmod(hrs, 24)
+    if days:
+        return f"{days}d{h}h"
+    if h:
+        return f"{h}h{m:02d}m"
+    return f"{max(m, 1)}m"
+
+
+def format_slurm_time(seconds: int) -> str:
+    """Format seconds as a SLURM time limit: 'HH:MM:SS' or 'D-HH:MM:SS'."""
+    mins, s = divmod(max(int(seconds), 0), 60)
+    hrs, m = divmod(mins, 60)
+    days, h = divmod(hrs, 24)
+    if days:
+        return f"{days}-{h:02d}:{m:02d}:{s:02d}"
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def best_shape(
+    gpu_budget: int,
+    compute_s: int,
+    jobs: List[Job],
+    node_totals: Dict[str, int],
+    node_states: Dict[str, str],
+) -> Tuple[int, int, int, int]:
+    """Choose the job shape that finishes first.
+    compute_s is the runtime when using all gpu_budget GPUs. Smaller shapes are assumed
+    to scale linearly, i.e. half the GPUs take twice as long.
+    Returns (n_nodes, n_gpu, time_s, wait_s) minimising wait + runtime.
+    """
+    max_gpus = max(node_totals.values(), default=0)
+    max_nodes = min(gpu_budget, len(node_totals))
+    if max_gpus == 0 or max_nodes == 0:
+        raise ValueError("No GPU nodes available.")
+    gpu_table, _ = availability_table(jobs, node_totals, node_states, max_nodes)
+    best = None
+    for k in range(1, max_nodes + 1):
+        for g in range(1, min(max_gpus, gpu_budget // k) + 1):
+            wait = gpu_table[k - 1][g - 1]
+            if wait >= 10**12:
+                continue
+            # Round the runtime up to full minutes
+            time_s = -(-compute_s * gpu_budget // (k * g) // 60) * 60
+            # On ties prefer the shape that starts first
+            key = (wait + time_s, wait)
+            if best is None or key < best[0]:
+                best = (key, (k, g, time_s, wait))
+    if best is None:
+        raise ValueError(f"No shape with at most {gpu_budget} GPUs can ever start.")
+    return best[1]
+
+
+# ---------- Library API ----------
+
+
+@dataclass
+class Eta:
+    seconds: int
+    # (node, seconds until the node satisfies the request), earliest first
+    candidate_nodes: List[Tuple[str, int]]
+    assumptions: List[str]
+
+    @property
+    def available_now(self) -> bool:
+        return self.seconds == 0
+
+    def __str__(self) -> str:
+        return fmt_duration(self.seconds)
+
+
+def _read_state(partition: str | None):
+    from slurm_tools.cluster_snapshot import get_snapshot
+
+    node_totals, _, node_states = read_nodes(partition, [])
+    if not node_totals:
+        raise NoNodesError("No nodes found (check --partition).")
     jobs = read_jobs(consider_cg=False)
-    max_per_node = max(node_totals.values()) if node_totals else 0
+    assumptions = [
+        "running jobs end at their time limit",
+        f"cluster state is {int(get_snapshot().age)}s old",
+    ]
+    return jobs, node_totals, node_states, assumptions
+
+
+def _unseen_alloc_nodes(jobs, node_totals, node_states) -> int:
+    seen = {n for j in jobs for n in j.nodes}
+    return sum(
+        1 for n in node_totals if node_states.get(n) == "alloc" and n not in seen
+    )
+
+
+def estimate_gpus(n_gpu: int, partition: str | None = None) -> Eta:
+    """Estimate when n_gpu GPUs are free on a single node."""
+    jobs, node_totals, node_states, assumptions = _read_state(partition)
+    max_per_node = max(node_totals.values())
     if n_gpu > max_per_node:
-        print(
-            f"❌ Request exceeds maximum GPUs on any single node (requested {n_gpu}, max per node {max_per_node})."
+        raise InsufficientResourcesError(
+            f"Request exceeds maximum GPUs on any single node (requested {n_gpu}, max per node {max_per_node})."
         )
-        sys.exit(1)
-    deadline, events = earliest_time_for_gpus(n_gpu, jobs, node_totals, node_states)
-    if deadline == 0:
-        print(f"✅ {n_gpu} GPU(s) are available now on at least one node.")
-        sys.exit(0)
+    n_unseen = _unseen_alloc_nodes(jobs, node_totals, node_states)
+    if n_unseen:
+        assumptions.append(
+            f"{n_unseen} allocated node(s) without visible jobs stay busy"
+        )
+    deadline, _ = earliest_time_for_gpus(n_gpu, jobs, node_totals, node_states)
     if deadline >= 10**12:
-        print(
-            "❌ Not enough GPUs will be free on any single node to satisfy the request (given current jobs/time limits)."
+        raise InsufficientResourcesError(
+            "Not enough GPUs will be free on any single node to satisfy the request (given current jobs/time limits)."
         )
-        sys.exit(1)
-    print(
-        f"⏳ Estimated wait for {n_gpu} free GPU(s) on a single node: {fmt_duration(deadline)}"
-    )
-    # Provide a short summary of nodes likely to meet the target by the deadline
+
+    # Nodes likely to meet the target by the deadline
+    used, events = gpu_usage(jobs, node_totals, node_states)
     candidates = []
     for n, total in node_totals.items():
-        # compute free at deadline on node n
-        free_now = max(
-            total - sum(j.gpus_per_node for j in jobs for nd in j.nodes if nd == n),
-            0,
+        free = max(total - used[n], 0)
+        if free >= n_gpu:
+            candidates.append((n, 0))
+            continue
+        for t, g in sorted(events[n]):
+            free += g
+            if t > deadline:
+                break
+            if free >= n_gpu:
+                candidates.append((n, t))
+                break
+    candidates.sort(key=lambda x: (x[1], x[0]))
+    return Eta(deadline, candidates, assumptions)
+
+
+def estimate_nodes(n_nodes: int, partition: str | None = None) -> Eta:
+    """Estimate when n_nodes nodes are completely free."""
+    jobs, node_totals, node_states, assumptions = _read_state(partition)
+    n_unseen = _unseen_alloc_nodes(jobs, node_totals, node_states)
+    if n_unseen:
+        assumptions.append(
+            f"{n_unseen} allocated node(s) without visible jobs are busy for 24h"
+        )
+    deadline, details = earliest_time_for_nodes(n_nodes, jobs, node_totals, node_states)
+    if deadline >= 10**12:
+        raise InsufficientResourcesError(
+            "Not enough nodes in this partition to satisfy the request."
         )
-        released = sum(g for t, g in events.get(n, []) if t <= deadline)
-        if free_now + released >= n_gpu:
-            candidates.append(n)
-    if candidates:
+    return Eta(deadline, sorted(details, key=lambda x: x[1]), assumptions)
+
+
+def estimate_table(
+    max_nodes: int, partition: str | None = None
+) -> Tuple[List[List[int]], List[int]]:
+    """The availability_table of the current cluster state."""
+    jobs, node_totals, node_states, _ = _read_state(partition)
+    return availability_table(jobs, node_totals, node_states, max_nodes)
+
+
+# ---------- CLI ----------
+
+
+def _exit_on_error(f):
+    """Print estimator errors and exit with the exit codes of the CLI."""
+
+    def wrapper(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except SlurmCommandError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        except NoNodesError as e:
+            print(e)
+            sys.exit(3)
+        except InsufficientResourcesError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    return wrapper
+
+
+@_exit_on_error
+def find_availability_table(max_nodes: int):
+    gpu_table, node_column = estimate_table(max_nodes)
+    header = ["nodes \\ gpus"] + [str(g + 1) for g in range(len(gpu_table[0]))]
+    rows = [header + ["whole"]]
+    for k, (row, whole) in enumerate(zip(gpu_table, node_column)):
+        rows.append([str(k + 1)] + [fmt_compact(t) for t in row] + [fmt_compact(whole)])
+    widths = [max(len(r[i]) for r in rows) for i in range(len(header) + 1)]
+    print("⏳ Estimated wait per job shape (GPUs per node x number of nodes):")
+    for r in rows:
+        print("  ".join(col.rjust(widths[i]) for i, col in enumerate(r)))
+    return gpu_table, node_column
+
+
+@_exit_on_error
+def find_n_gpu(n_gpu: int):
+    eta = estimate_gpus(n_gpu)
+    if eta.available_now:
+        print(f"✅ {n_gpu} GPU(s) are available now on at least one node.")
+        sys.exit(0)
+    print(f"⏳ Estimated wait for {n_gpu} free GPU(s) on a single node: {eta}")
+    if eta.candidate_nodes:
         print("Nodes that may meet the target by the ETA:")
-        for n in sorted(candidates)[:10]:
+        for n, _ in sorted(eta.candidate_nodes)[:10]:
             print(f"  - {n}")
-    return deadline
+    return eta.seconds
 
 
+@_exit_on_error
 def find_n_nodes(n_nodes: int):
-    node_totals, _, node_states = read_nodes(None, [])
-    if not node_totals:
-        print("No nodes found (check --partition).")
-        sys.exit(3)
-
-    jobs = read_jobs(consider_cg=False)
-    deadline, details = earliest_time_for_nodes(n_nodes, jobs, node_totals, node_states)
-    if deadline == 0:
+    eta = estimate_nodes(n_nodes)
+    if eta.available_now:
         print(f"✅ {n_nodes} node(s) are available now.")
         sys.exit(0)
-    if deadline >= 10**12:
-        print("❌ Not enough nodes in this partition to satisfy the request.")
-        sys.exit(1)
-    print(f"⏳ Estimated wait for {n_nodes} free node(s): {fmt_duration(deadline)}")
+    print(f"⏳ Estimated wait for {n_nodes} free node(s): {eta}")
     print("Details (first nodes to free):")
-    for n, t in sorted(details, key=lambda x: x[1]):
+    for n, t in eta.candidate_nodes:
         print(f"  - {n}: {fmt_duration(t)}")
-    return deadline
+    return eta.seconds
 
 
 def main():
@@ -450,6 +717,14 @@ def main():
     g.add_argument(
         "--n-gpu", type=int, help="Number of free GPUs required on a single node"
     )
+    g.add_argument(
+        "--table",
+        action="store_true",
+        help="Print the wait for every GPU count and node count",
+    )
+    ap.add_argument(
+        "--max-nodes", type=int, default=8, help="Number of node rows for --table"
+    )
 
     args = ap.parse_args()
 
@@ -459,6 +734,9 @@ def main():
     if args.n_gpu is not None:
         find_n_gpu(args.n_gpu)
 
+    if args.table:
+        find_availability_table(args.max_nodes)
+
 
 if __name__ == "__main__":
     main()
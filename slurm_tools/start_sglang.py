@@ -1,18 +1,14 @@
 import argparse
-import subprocess
 import os
-from datetime import datetime
+from slurm_tools.daemon import forwarded
+from slurm_tools.run_index import add_job_dir
+from slurm_tools.submit import PendingSubmission, submit
+from slurm_tools.templates import load_template
+from slurm_tools.util import generate_local_job_id
 
 basedir = os.path.dirname(os.path.abspath(__file__))
 
 
-def generate_local_job_id():
-    """
-    Generates a local job ID based on timestamp.
-    """
-    return datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
-
-
 def slurm_job(
     model,
     command,
@@ -40,7 +36,6 @@ def slurm_job(
     job_id = generate_local_job_id()
     dest_dir = os.path.join(os.environ["HOME"], "runs")
     job_specific_dir = os.path.join(dest_dir, experiment_name, job_id)
-    os.makedirs(job_specific_dir, exist_ok=True)
 
     if skip_capture_cuda_graph:
         capture_cuda = "--disable-cuda-graph"
@@ -53,33 +48,38 @@ def slurm_job(
 
     source_env = f"source {os.path.expanduser(env_file)}" if env_file else ""
 
-    with open(template_file, "r") as f:
-        script = f.read().format(
-            model=model,
-            command=command,
-            time=time,
-            sif_path=os.path.expanduser(image),
-            n_nodes=n_nodes,
-            job_dir=job_specific_dir,
-            job_id=job_id,
-            n_gpu=n_gpu,
-            tp_size=tp_size,
-            conda_activate=conda_activate,
-            basepath=basedir,
-            experiment_name=experiment_name,
-            sglang_nodes=sglang_nodes,
-            capture_cuda=capture_cuda,
-            chat_template_arg=chat_template_arg,
-            context_length_arg=context_length_arg,
-            source_env=source_env,
-        )
+    format_dict = dict(
+        model=model,
+        command=command,
+        time=time,
+        sif_path=os.path.expanduser(image),
+        n_nodes=n_nodes,
+        job_dir=job_specific_dir,
+        job_id=job_id,
+        n_gpu=n_gpu,
+        tp_size=tp_size,
+        conda_activate=conda_activate,
+        basepath=basedir,
+        experiment_name=experiment_name,
+        sglang_nodes=sglang_nodes,
+        capture_cuda=capture_cuda,
+        chat_template_arg=chat_template_arg,
+        context_length_arg=context_length_arg,
+        source_env=source_env,
+    )
+    template = load_template(template_file)
+    template.check(format_dict)
+    os.makedirs(job_specific_dir, exist_ok=False)
+    script = template.render(format_dict)
 
     output_path = os.path.join(job_specific_dir, "slurm_script.sh")
     with open(output_path, "w") as f:
         f.write(script)
 
-    if not dry:
-        subprocess.run(["sbatch", output_path])
+    if dry:
+        add_job_dir(job_specific_dir)
+    else:
+        submit(PendingSubmission(job_specific_dir, [output_path]))
 
 
 def obtain_parser():
@@ -124,6 +124,7 @@ def obtain_parser():
     return parser
 
 
+@forwarded
 def main():
     parser = obtain_parser()
     args = parser.parse_args()
@@ -0,0 +1,105 @@
+import os
+import re
+from collections import namedtuple
+from slurm_tools.run_index import add_job_dir
+
+SUBMITTED_RE = re.compile(r"Submitted batch job (\d+)")
+
+# stderr fragments of sbatch failures that usually go away when retrying later
+TRANSIENT_ERRORS = (
+    "Socket timed out",
+    "AssocMaxSubmitJobLimit",
+    "QOSMaxSubmitJobPerUserLimit",
+    "Unable to contact slurm controller",
+    "Resource temporarily unavailable",
+    "Zero Bytes were transmitted or received",
+)
+
+MAX_BACKOFF = 300
+
+
+class SubmissionError(RuntimeError):
+    pass
+
+
+# A rendered job that is ready to be submitted with `sbatch <sbatch_args>`. If script is
+# not None, it is passed to sbatch via stdin instead of a script file in sbatch_args.
+# A namedtuple instead of a dataclass, since importing dataclasses is slow.
+PendingSubmission = namedtuple(
+    "PendingSubmission", ["job_dir", "sbatch_args", "script"], defaults=[None]
+)
+
+
+def is_transient(stderr: str) -> bool:
+    return any(err in stderr for err in TRANSIENT_ERRORS)
+
+
+def sbatch(
+    args: list[str], retries: int = 5, backoff: float = 2.0, script: str | None = None
+) -> int:
+    """
+    Run sbatch with the given arguments and return the slurm job ID.
+    If script is given, it is passed to sbatch via stdin.
+    Transient slurmctld errors are retried with exponential backoff.
+    """
+    import random
+    import subprocess
+    import time
+
+    cmd = ["sbatch", *args]
+    for attempt in range(retries + 1):
+        proc = subprocess.run(cmd, capture_output=True, text=True, input=script)
+        if proc.returncode == 0:
+            m = SUBMITTED_RE.search(proc.stdout)
+            if m is None:
+                raise SubmissionError(
+                    f"Could not parse job ID from sbatch output: {proc.stdout!r}"
+                )
+            print(proc.stdout.strip())
+            return int(m.group(1))
+        stderr = proc.stderr.strip()
+        if attempt < retries and is_transient(stderr):
+            delay = min(backoff * 2**attempt, MAX_BACKOFF) * random.uniform(1, 1.5)
+            print(f"sbatch failed ({stderr}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        raise SubmissionError(f"{' '.join(cmd)} failed: {stderr}")
+    raise AssertionError("unreachable")
+
+
+def record_job_id(job_dir: str, slurm_job_id: int):
+    with open(os.path.join(job_dir, "slurm_job_id"), "a") as file:
+        file.write(f"{slurm_job_id}\n")
+
+
+def submit(submission: PendingSubmission, retries: int = 5) -> int:
+    slurm_job_id = sbatch(
+        submission.sbatch_args, retries=retries, script=submission.script
+    )
+    record_job_id(submission.job_dir, slurm_job_id)
+    add_job_dir(submission.job_dir, slurm_job_id)
+    return slurm_job_id
+
+
+def submit_many(
+    submissions: list[PendingSubmission], max_workers: int = 8, retries: int = 5
+) -> list[int | None]:
+    """
+    Submit many jobs concurrently with a bounded pool of sbatch workers.
+    Returns the slurm job IDs in the order of submissions (None for failed ones).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _submit(submission):
+        try:
+            return submit(submission, retries=retries)
+        except SubmissionError as e:
+            print(f"Submission of {submission.job_dir} failed: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        job_ids = list(pool.map(_submit, submissions))
+
+    n_failed = sum(job_id is None for job_id in job_ids)
+    print(f"Submitted {len(job_ids) - n_failed}/{len(job_ids)} jobs.")
+    return job_ids
@@ -0,0 +1,117 @@
+"""
+Manifest of the grid points of a parameter sweep, stored as JSONL in the run group.
+
+Every submitted point appends a line with its parameters, job directory and slurm job
+ID. States looked up with sacct are appended as well, so that finished points do not
+have to be queried again. The newest line of a point wins. `param_sweep --resume` uses
+the manifest to resubmit only points that are missing, failed or timed out.
+"""
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = ".sweep.jsonl"
+
+ACTIVE_STATES = {
+    "PENDING",
+    "RUNNING",
+    "REQUEUED",
+    "RESIZING",
+    "SUSPENDED",
+    "CONFIGURING",
+    "COMPLETING",
+}
+DONE_STATES = {"COMPLETED"}
+
+_lock = threading.Lock()
+
+
+def manifest_path(run_group_dir: str) -> str:
+    return os.path.join(run_group_dir, MANIFEST_NAME)
+
+
+def point_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+def record(run_group_dir: str, entries: list[dict]):
+    """Append entries, each holding at least the params of its point."""
+    lines = "".join(
+        json.dumps({"key": point_key(e["params"]), "time": time.time(), **e}) + "\n"
+        for e in entries
+    )
+    os.makedirs(run_group_dir, exist_ok=True)
+    with _lock, open(manifest_path(run_group_dir), "a") as file:
+        file.write(lines)
+
+
+def record_submissions(run_group_dir: str, submitted: list[tuple]):
+    """Record (params, job dir, slurm job ID) of submitted points.
+    Points whose submission failed (job ID None) are skipped.
+    """
+    record(
+        run_group_dir,
+        [
+            dict(params=p, job_dir=d, slurm_job_id=str(j), state=None)
+            for p, d, j in submitted
+            if j is not None
+        ],
+    )
+
+
+def load(run_group_dir: str) -> dict[str, dict]:
+    """Return point key -> merged entry of the point."""
+    points: dict[str, dict] = {}
+    try:
+        with open(manifest_path(run_group_dir), "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partially written line
+                if "slurm_job_id" in entry:
+                    # A new submission of the point replaces everything before it
+                    points[entry["key"]] = entry
+                else:
+                    points.setdefault(entry["key"], {}).update(entry)
+    except FileNotFoundError:
+        pass
+    return points
+
+
+def refresh_states(run_group_dir: str, points: dict[str, dict]):
+    """Look up the state of all points that are not known to be done in one sacct call
+    and record the states that changed.
+    """
+    from slurm_tools.cluster_snapshot import job_states
+
+    stale = [
+        p
+        for p in points.values()
+        if p.get("slurm_job_id") and p.get("state") not in DONE_STATES
+    ]
+    if not stale:
+        return
+    states = job_states([p["slurm_job_id"] for p in stale])
+    changed = []
+    for p in stale:
+        state = states.get(p["slurm_job_id"])
+        if state is not None and state != p.get("state"):
+            p["state"] = state
+            changed.append(dict(params=p["params"], state=state))
+    if changed:
+        record(run_group_dir, changed)
+
+
+def status(point: dict | None) -> str:
+    """missing, done, active or the failed terminal state of a point."""
+    if point is None or not point.get("slurm_job_id"):
+        return "missing"
+    state = point.get("state")
+    if state in DONE_STATES:
+        return "done"
+    if state in ACTIVE_STATES:
+        return "active"
+    # Unknown to sacct: either just submitted or purged from the accounting database
+    return state or "unknown"
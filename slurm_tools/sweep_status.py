@@ -0,0 +1,187 @@
+"""
+Show the state of every point of a sweep (or every job of a run group) in one table.
+
+Points come from the sweep manifest of the run group, or from the run index if the run
+group has no manifest. States, exit codes and elapsed times of all jobs are queried with
+a single sacct call, with a fallback to the cached squeue snapshot if accounting is not
+available. Only the last few KB of each log are read to show its last line.
+
+Examples
+--------
+sweep_status my_sweep
+sweep_status my_sweep --state FAILED
+"""
+import argparse
+import os
+import shutil
+from collections import Counter
+
+from slurm_tools import sweep_manifest
+from slurm_tools.daemon import forwarded
+from slurm_tools.util import iter_lines_reversed
+
+TAIL_BYTES = 4096
+
+
+def last_line(path: str | None) -> str:
+    if path is None:
+        return ""
+    try:
+        line = next(iter_lines_reversed(path, chunk_size=TAIL_BYTES), "")
+    except OSError:
+        return ""
+    # Progress bars rewrite the line with carriage returns
+    return line.rstrip("\r").split("\r")[-1].strip()
+
+
+def find_log(
+    job_dir: str, slurm_job_id: str | None, pack_line: str | None
+) -> str | None:
+    """The log of a job, of an array task (<jobid>_<task>) or of a packed point."""
+    try:
+        names = os.listdir(job_dir)
+    except FileNotFoundError:
+        return None
+    if pack_line is not None and "pack_points.txt" in names:
+        with open(os.path.join(job_dir, "pack_points.txt"), "r") as file:
+            lines = [line.strip() for line in file]
+        if pack_line in lines:
+            name = f"point_{lines.index(pack_line)}.log"
+            return os.path.join(job_dir, name) if name in names else None
+    logs = [n for n in names if n.startswith("slurm-") and n.endswith(".out")]
+    if slurm_job_id and "_" in slurm_job_id:
+        logs = [n for n in logs if n.endswith(f"-{slurm_job_id}.out")]
+    elif slurm_job_id:
+        logs = [n for n in logs if n.endswith(f"-{slurm_job_id}.out")] or logs
+    if not logs:
+        return None
+    return max((os.path.join(job_dir, n) for n in logs), key=os.path.getmtime)
+
+
+def query_accounting(job_ids: list[str]) -> dict:
+    from slurm_tools.cluster_snapshot import (
+        JOB_STATES,
+        AccountingRecord,
+        get_snapshot,
+        job_accounting,
+    )
+    from slurm_tools.slurm_time_until_start import SlurmCommandError
+
+    if not job_ids:
+        return {}
+    try:
+        return job_accounting(job_ids)
+    except SlurmCommandError:
+        long_states = {v: k for k, v in JOB_STATES.items()}
+        records = {}
+        for jobid in job_ids:
+            job = get_snapshot().job(jobid)
+            if job is not None:
+                state = long_states.get(job.state, job.state)
+                records[jobid] = AccountingRecord(jobid, state, "", job.elapsed_s)
+        return records
+
+
+def sweep_rows(dest_dir: str, run_group: str) -> list[dict]:
+    """One row per point of the sweep, or per job of the run group without a manifest."""
+    from slurm_tools.param_sweep import format_param_choices
+
+    run_group_dir = os.path.join(dest_dir, run_group)
+    points = sweep_manifest.load(run_group_dir)
+    if points:
+        rows = [
+            dict(
+                label=format_param_choices(p["params"]),
+                job_dir=p.get("job_dir"),
+                slurm_job_id=p.get("slurm_job_id"),
+                pack_line=format_param_choices(p["params"]),
+            )
+            for p in points.values()
+        ]
+    else:
+        from slurm_tools.run_index import iter_entries
+
+        rows = [
+            dict(
+                label=e["job_id"],
+                job_dir=e["job_dir"],
+                slurm_job_id=(
+                    None if e["slurm_job_id"] is None else str(e["slurm_job_id"])
+                ),
+                pack_line=None,
+            )
+            for e in iter_entries(dest_dir)
+            if e["run_group"] == run_group
+        ][::-1]
+
+    accounting = query_accounting(
+        [r["slurm_job_id"] for r in rows if r["slurm_job_id"]]
+    )
+    for r in rows:
+        record = accounting.get(r["slurm_job_id"])
+        r["state"] = (
+            record.state if record else ("UNKNOWN" if r["slurm_job_id"] else "DRY")
+        )
+        r["exit_code"] = record.exit_code if record else ""
+        r["elapsed_s"] = record.elapsed_s if record else 0
+        r["last_line"] = (
+            last_line(find_log(r["job_dir"], r["slurm_job_id"], r["pack_line"]))
+            if r["job_dir"]
+            else ""
+        )
+    return rows
+
+
+def print_rows(rows: list[dict]):
+    from slurm_tools.slurm_time_until_start import format_slurm_time
+
+    table = [["POINT", "JOBID", "STATE", "ELAPSED", "EXIT", "LAST LINE"]]
+    for r in rows:
+        table.append(
+            [
+                r["label"],
+                r["slurm_job_id"] or "-",
+                r["state"],
+                format_slurm_time(r["elapsed_s"]) if r["elapsed_s"] else "-",
+                r["exit_code"] or "-",
+                r["last_line"],
+            ]
+        )
+    widths = [max(len(row[i]) for row in table) for i in range(5)]
+    term_width = shutil.get_terminal_size((160, 20)).columns
+    for row in table:
+        line = "  ".join(col.ljust(widths[i]) for i, col in enumerate(row[:5]))
+        line = f"{line}  {row[5]}"
+        print(line[:term_width])
+
+
+@forwarded
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("run_group", type=str)
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=os.path.join(os.environ["HOME"], "runs"),
+        help="Directory containing the run groups.",
+    )
+    parser.add_argument(
+        "--state", type=str, default=None, help="Only show points in this state."
+    )
+    args = parser.parse_args()
+
+    rows = sweep_rows(args.path, args.run_group)
+    if not rows:
+        print(f"No jobs found for run group {args.run_group}.")
+        return
+    counts = Counter(r["state"] for r in rows)
+    if args.state:
+        rows = [r for r in rows if r["state"] == args.state.upper()]
+    print_rows(rows)
+    print(", ".join(f"{n} {state}" for state, n in counts.most_common()))
+
+
+if __name__ == "__main__":
+    main()
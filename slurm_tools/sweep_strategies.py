@@ -0,0 +1,190 @@
+"""
+Search strategies for param_sweep.
+
+A sweep config maps every parameter to either a list of values or a range:
+
+    lr: {min: 1.0e-5, max: 1.0e-3, log: true}
+    batch_size: [32, 64, 128]
+    layers: {min: 2, max: 8, int: true}
+
+Point strategies return the list of parameter choices to submit:
+  - grid: the full product of all value lists (ranges are not allowed)
+  - random: budget points sampled uniformly (log-uniformly for log ranges)
+  - lhs: budget points of a Latin hypercube, every parameter is stratified into
+    budget equally likely intervals that are each used exactly once
+
+Successive halving and Hyperband are multi-fidelity strategies. Every config is first
+run with a small value of the resource parameter (e.g. --epochs). Only the best 1/eta
+configs of each rung are run again with eta times the resource, until max_resource is
+reached. The metric of a finished job is the last match of a regex in its slurm log.
+Hyperband runs several successive halving brackets that trade the number of configs
+against their starting resource.
+"""
+from __future__ import annotations
+import itertools
+import math
+import os
+import random
+import re
+
+from slurm_tools.util import iter_lines_reversed
+
+DEFAULT_METRIC_REGEX = r"metric[=:]\s*([-+]?[0-9.]+(?:[eE][-+]?\d+)?)"
+
+
+def _is_range(spec) -> bool:
+    return isinstance(spec, dict)
+
+
+def _value(spec, u: float):
+    """Map u in [0, 1) to a value of the parameter."""
+    if not _is_range(spec):
+        return spec[min(int(u * len(spec)), len(spec) - 1)]
+    lo, hi = spec["min"], spec["max"]
+    if spec.get("int"):
+        return min(int(lo + u * (hi - lo + 1)), hi)
+    if spec.get("log"):
+        return math.exp(math.log(lo) + u * (math.log(hi) - math.log(lo)))
+    return lo + u * (hi - lo)
+
+
+def grid(sweep_params: dict, budget: int = 0, rng: random.Random = None) -> list[dict]:
+    ranges = [k for k, spec in sweep_params.items() if _is_range(spec)]
+    if ranges:
+        raise ValueError(
+            f"Grid search needs lists of values, got ranges for {', '.join(ranges)}."
+        )
+    keys = list(sweep_params.keys())
+    return [dict(zip(keys, v)) for v in itertools.product(*sweep_params.values())]
+
+
+def random_search(sweep_params: dict, budget: int, rng: random.Random) -> list[dict]:
+    return [
+        {k: _value(spec, rng.random()) for k, spec in sweep_params.items()}
+        for _ in range(budget)
+    ]
+
+
+def latin_hypercube(sweep_params: dict, budget: int, rng: random.Random) -> list[dict]:
+    points = [{} for _ in range(budget)]
+    for k, spec in sweep_params.items():
+        strata = list(range(budget))
+        rng.shuffle(strata)
+        for point, stratum in zip(points, strata):
+            point[k] = _value(spec, (stratum + rng.random()) / budget)
+    return points
+
+
+STRATEGIES = {
+    "grid": grid,
+    "random": random_search,
+    "lhs": latin_hypercube,
+}
+
+
+def sample_points(
+    sweep_params: dict, strategy: str = "grid", budget: int = 0, seed: int = 0
+) -> list[dict]:
+    """Points of a point strategy. The same seed always gives the same points."""
+    if strategy != "grid" and budget <= 0:
+        raise ValueError(f"The {strategy} strategy needs a budget > 0.")
+    return STRATEGIES[strategy](sweep_params, budget, random.Random(seed))
+
+
+# ---------- Successive halving / Hyperband ----------
+
+
+class Bracket:
+    def __init__(self, configs: list[dict], resource: float, rungs_left: int, eta: int):
+        self.configs = configs
+        self.resource = resource
+        self.rungs_left = rungs_left
+        self.eta = eta
+        # (metric, config) of the last rung that was run
+        self.results: list[tuple[float | None, dict]] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.rungs_left == 0
+
+    def promote(self, metrics: list[float | None], minimize: bool = True):
+        """Keep the best 1/eta configs of the rung that was just run."""
+        worst = math.inf if minimize else -math.inf
+        ranked = sorted(
+            zip(metrics, self.configs),
+            key=lambda x: worst if x[0] is None else x[0],
+            reverse=not minimize,
+        )
+        self.results = ranked
+        self.rungs_left -= 1
+        if not self.finished:
+            self.configs = [c for _, c in ranked[: max(1, len(ranked) // self.eta)]]
+            self.resource *= self.eta
+
+
+def successive_halving(
+    sweep_params: dict,
+    budget: int,
+    min_resource: float,
+    max_resource: float,
+    eta: int = 3,
+    seed: int = 0,
+) -> list[Bracket]:
+    """One bracket starting budget random configs at min_resource."""
+    n_rungs = int(math.log(max_resource / min_resource, eta) + 1e-9) + 1
+    configs = random_search(sweep_params, budget, random.Random(seed))
+    return [Bracket(configs, min_resource, n_rungs, eta)]
+
+
+def hyperband(
+    sweep_params: dict,
+    budget: int,
+    min_resource: float,
+    max_resource: float,
+    eta: int = 3,
+    seed: int = 0,
+) -> list[Bracket]:
+    """The brackets of Hyperband. The number of configs follows from the resources."""
+    rng = random.Random(seed)
+    s_max = int(math.log(max_resource / min_resource, eta) + 1e-9)
+    brackets = []
+    for s in range(s_max, -1, -1):
+        n = math.ceil((s_max + 1) / (s + 1) * eta**s)
+        brackets.append(
+            Bracket(
+                random_search(sweep_params, n, rng), max_resource * eta**-s, s + 1, eta
+            )
+        )
+    return brackets
+
+
+MULTI_FIDELITY_STRATEGIES = {"sha": successive_halving, "hyperband": hyperband}
+
+
+def format_resource(resource: float, min_resource: float, max_resource: float):
+    if float(min_resource).is_integer() and float(max_resource).is_integer():
+        return int(min(max(round(resource), min_resource), max_resource))
+    return resource
+
+
+def read_metric(job_dir: str, pattern: str = DEFAULT_METRIC_REGEX) -> float | None:
+    """Last value matched by the first group of pattern in the newest slurm log of job_dir."""
+    try:
+        logs = [
+            os.path.join(job_dir, f)
+            for f in os.listdir(job_dir)
+            if f.startswith("slurm-") and f.endswith(".out")
+        ]
+    except FileNotFoundError:
+        return None
+    if not logs:
+        return None
+    regex = re.compile(pattern)
+    for line in iter_lines_reversed(max(logs, key=os.path.getmtime)):
+        m = regex.search(line)
+        if m:
+            try:
+                return float(m.group(1))
+            except ValueError:
+                continue
+    return None
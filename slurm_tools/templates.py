@@ -0,0 +1,112 @@
+"""
+Compiled slurm script templates.
+
+Templates are plain `str.format` templates. Each template is parsed once into a
+CompiledTemplate that knows its placeholders, so missing values are reported before any
+job directory is created instead of as a bare KeyError while rendering. Compiled
+templates are cached in memory and on disk (~/.cache/slurm_tools/templates), keyed by
+the path, mtime and size of the template file, so a sweep only has to stat the template
+instead of reading it from a network filesystem for every job.
+"""
+from __future__ import annotations
+import os
+from collections import namedtuple
+from collections.abc import Iterable, Mapping
+
+from slurm_tools.util import cache_dir, write_json_atomic
+
+
+class TemplateError(ValueError):
+    """A template is malformed or uses placeholders that are not provided."""
+
+
+class CompiledTemplate(namedtuple("CompiledTemplate", ["path", "source", "fields"])):
+    """The source of a template and the set of its placeholders."""
+
+    def missing(self, keys: Iterable[str]) -> list[str]:
+        return sorted(self.fields - set(keys))
+
+    def check(self, keys: Iterable[str]):
+        """Raise a TemplateError if the template uses placeholders that are not in keys."""
+        missing = self.missing(keys)
+        if missing:
+            raise TemplateError(
+                f"Template {self.path} uses placeholders without a value: "
+                + ", ".join("{" + k + "}" for k in missing)
+            )
+
+    def render(self, values: Mapping[str, object]) -> str:
+        self.check(values)
+        return self.source.format_map(values)
+
+
+def compile_template(source: str, path: str = "<string>") -> CompiledTemplate:
+    import string
+
+    fields = set()
+    try:
+        for _, field_name, _, _ in string.Formatter().parse(source):
+            if field_name is None:
+                continue
+            if field_name == "" or field_name.isdigit():
+                raise TemplateError(
+                    f"Template {path} uses positional placeholders, use named ones."
+                )
+            # {a.b} and {a[0]} both need the value a
+            fields.add(field_name.split(".")[0].split("[")[0])
+    except ValueError as e:
+        if isinstance(e, TemplateError):
+            raise
+        raise TemplateError(f"Template {path} is malformed: {e}") from e
+    return CompiledTemplate(path, source, frozenset(fields))
+
+
+_memo: dict[str, tuple[tuple[int, int], CompiledTemplate]] = {}
+
+
+def _disk_cache_path(path: str, key: tuple[int, int]) -> str:
+    import hashlib
+
+    digest = hashlib.sha1(f"{path}|{key[0]}|{key[1]}".encode()).hexdigest()
+    return os.path.join(cache_dir(), "templates", f"{digest}.json")
+
+
+def load_template(path: str) -> CompiledTemplate:
+    """Return the compiled template at path, re-reading it only if it changed."""
+    import json
+
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _memo.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    cache_path = _disk_cache_path(path, key)
+    try:
+        with open(cache_path, "r") as file:
+            data = json.load(file)
+        template = CompiledTemplate(path, data["source"], frozenset(data["fields"]))
+    except (OSError, ValueError, KeyError):
+        with open(path, "r") as file:
+            template = compile_template(file.read(), path)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            write_json_atomic(
+                cache_path,
+                {"source": template.source, "fields": sorted(template.fields)},
+            )
+        except OSError:
+            pass
+    _memo[path] = (key, template)
+    return template
+
+
+def render_many(
+    template: CompiledTemplate, values: Iterable[Mapping[str, object]]
+) -> list[str]:
+    """Render the template once per mapping, validating all mappings before rendering."""
+    values = list(values)
+    for v in values:
+        template.check(v)
+    return [template.source.format_map(v) for v in values]
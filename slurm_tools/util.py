@@ -5,3 +5,67 @@ def load_yaml(path):
         return {}
     with open(path, "r") as file:
         return yaml.safe_load(file)
+
+
+def cache_dir():
+    """Directory for caches shared between invocations of the tools."""
+    import os
+
+    path = os.environ.get(
+        "SLURM_TOOLS_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "slurm_tools"),
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_json_atomic(path, data):
+    import json
+    import os
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def iter_lines_reversed(path, chunk_size=1 << 16):
+    """Yield the lines of a file from last to first, reading it backwards in chunks."""
+    import os
+
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        pos = file.tell()
+        rest = b""
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            file.seek(pos)
+            lines = (file.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8", errors="replace")
+        if rest.strip():
+            yield rest.decode("utf-8", errors="replace")
+
+
+_last_job_id_us = 0
+
+
+def generate_local_job_id():
+    """
+    Generates a lexically sortable local job ID from the current time in microseconds
+    and a random suffix, e.g. 2025_01_01__12_00_00_000123_9f2c.
+    IDs generated by the same process are strictly increasing.
+    """
+    import secrets
+    import time
+    from datetime import datetime
+
+    global _last_job_id_us
+    now_us = max(time.time_ns() // 1000, _last_job_id_us + 1)
+    _last_job_id_us = now_us
+    seconds, micros = divmod(now_us, 1_000_000)
+    timestamp = datetime.fromtimestamp(seconds).strftime("%Y_%m_%d__%H_%M_%S")
+    return f"{timestamp}_{micros:06d}_{secrets.token_hex(2)}"